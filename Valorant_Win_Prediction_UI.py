@@ -1,8 +1,16 @@
-import pickle
-import pandas as pd
+import os
+
+import numpy as np
 import tkinter as tk
 from tkinter import ttk, messagebox, font
 
+from comp_index import DEFAULT_COMP_INDEX_PATH, CompIndex
+from draft_assistant import DraftAssistant
+from model_registry import DEFAULT_REGISTRY_DIR, ModelRegistry
+from prediction_worker import LatestRequestWorker
+from feature_encoder import ALL_AGENTS, ALL_MAPS, EXPECTED_COLUMN_ORDER, FeatureEncoder
+from valorant_model import DEFAULT_ARTIFACT_PATH, DEFAULT_MODEL_PATH, load_predictor, predict_win_proba
+
 class ValorantMatchPredictor(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -27,26 +35,11 @@ class ValorantMatchPredictor(tk.Tk):
             pass
 
         # Define agents and maps
-        self.all_agents = sorted(['yoru', 'chamber', 'reyna', 'breach', 'cypher',
-                           'phoenix', 'sage', 'astra', 'raze', 'viper',
-                           'jett', 'brimstone', 'killjoy', 'omen', 'skye',
-                           'kayo', 'sova'])
-
-        self.all_maps = ['Ascent', 'Bind', 'Breeze', 'Fracture', 'Haven',
-                         'Icebox', 'Split', 'TBD']
-
-        # Expected column order for the model
-        self.expected_column_order = ['RoundNumber', 'Team1_RoundScore', 'Team2_RoundScore', 'team1_astra',
-                                   'team1_breach', 'team1_brimstone', 'team1_chamber', 'team1_cypher',
-                                   'team1_jett', 'team1_kayo', 'team1_killjoy', 'team1_omen',
-                                   'team1_phoenix', 'team1_raze', 'team1_reyna', 'team1_sage',
-                                   'team1_skye', 'team1_sova', 'team1_viper', 'team1_yoru', 'team2_astra',
-                                   'team2_breach', 'team2_brimstone', 'team2_chamber', 'team2_cypher',
-                                   'team2_jett', 'team2_kayo', 'team2_killjoy', 'team2_omen',
-                                   'team2_phoenix', 'team2_raze', 'team2_reyna', 'team2_sage',
-                                   'team2_skye', 'team2_sova', 'team2_viper', 'team2_yoru', 'Map_Ascent',
-                                   'Map_Bind', 'Map_Breeze', 'Map_Fracture', 'Map_Haven', 'Map_Icebox',
-                                   'Map_Split', 'Map_TBD']
+        self.all_agents = list(ALL_AGENTS)
+        self.all_maps = list(ALL_MAPS)
+
+        # Expected column order for the model, replaced by the model's own schema on load
+        self.expected_column_order = list(EXPECTED_COLUMN_ORDER)
 
         # Initialize game state variables
         self.team1_agents = []
@@ -56,9 +49,29 @@ class ValorantMatchPredictor(tk.Tk):
         self.team1_score = 0
         self.team2_score = 0
 
+        # Win probabilities for every score state of the current match, indexed by
+        # [team1_score, team2_score]. Regulation is first to 13, and overtime is
+        # covered up to max_overtime_rounds rounds past 12-12
+        self.max_overtime_rounds = 12
+        self.max_table_score = 13 + self.max_overtime_rounds // 2
+        self.probability_table = None
+        self.table_pending = False
+
+        # Average each prediction with the same state seen from the other side, so
+        # swapping the teams gives mirrored probabilities. Off by default, like the model itself
+        self.symmetric_predictions = tk.BooleanVar(value=False)
+
+        # Model calls run on a background thread that only keeps the newest request,
+        # and results come back to the Tk thread through a virtual event
+        self.prediction_worker = LatestRequestWorker(notify=self.notify_prediction_ready)
+        self.bind("<<PredictionReady>>", self.on_prediction_ready)
+
         # Load the pre-trained model
         self.load_model()
 
+        # Historical comp and matchup win rates, shown next to the model's probability
+        self.load_comp_index()
+
         # Create UI elements
         self.create_widgets()
 
@@ -88,13 +101,82 @@ class ValorantMatchPredictor(tk.Tk):
             pass
 
     def load_model(self):
+        # A model directory serves several models, routed by map on the worker thread
+        self.model_registry = None
+        if os.path.isdir(DEFAULT_REGISTRY_DIR):
+            registry = ModelRegistry(DEFAULT_REGISTRY_DIR)
+            registry.refresh()
+            if registry.models:
+                self.model_registry = registry
+                # Offer every agent and map some model knows; each encoder ignores names outside its schema
+                self.all_agents, self.all_maps = registry.vocabulary()
+                print(f"Model registry loaded: {', '.join(registry.models)}")
+                # Replaced model files are picked up for the next prediction
+                registry.start_watching()
+                # Resolved per job by model_for(); loading a routed model must not block the Tk thread
+                self.rf_model = self.encoder = self.draft_assistant = None
+                return
+            print(f"No loadable models in '{DEFAULT_REGISTRY_DIR}', using the default model")
+
+        # Prefers the memory-mapped artifact and falls back to the pickle
         try:
-            with open('gradient_boosting_model2.pkl', 'rb') as f:
-                self.rf_model = pickle.load(f)
+            self.rf_model, columns, agents, maps = load_predictor()
             print("Model loaded successfully!")
         except FileNotFoundError:
-            messagebox.showerror("Error", "Model file 'gradient_boosting_model2.pkl' not found!")
+            messagebox.showerror("Error", f"Model file '{DEFAULT_ARTIFACT_PATH}' or "
+                                          f"'{DEFAULT_MODEL_PATH}' not found!")
+            self.destroy()
+            return
+        except ValueError as e:
+            # A corrupt or incompatible artifact with no pickle to fall back to
+            messagebox.showerror("Error", f"Could not load the model: {e}")
             self.destroy()
+            return
+
+        # Take column order and vocabularies from the model rather than trusting the defaults
+        if columns != self.expected_column_order:
+            print("Model column order differs from the built-in list, using the model's schema")
+        self.expected_column_order = columns
+        self.all_agents = sorted(agents)
+        self.all_maps = maps
+
+        # Encoder resolves column positions once, so predictions skip pandas entirely
+        self.encoder = FeatureEncoder(self.all_agents, self.all_maps, self.expected_column_order)
+
+        # Scores every remaining pick of a draft in one batch, caching recent draft states
+        self.draft_assistant = DraftAssistant(self.rf_model, self.encoder)
+
+    def check_model(self, map_name):
+        # With a registry, warn up front if no model serves map_name. Routing is a table
+        # lookup; the routed model is only loaded by the job that needs it
+        if self.model_registry is None:
+            return True
+        try:
+            self.model_registry.spec_for(map_name)
+        except ValueError as e:
+            messagebox.showwarning("Warning", str(e))
+            return False
+        return True
+
+    def model_for(self, map_name):
+        # Runs on the worker thread, where a registry may load (or reload after eviction)
+        # the routed model. Model and encoder always come from the same route
+        if self.model_registry is None:
+            return self.rf_model, self.encoder
+        loaded = self.model_registry.route(map_name)
+        return loaded.model, loaded.encoder
+
+    def load_comp_index(self):
+        # Optional: without a prebuilt index the history line just says so
+        try:
+            self.comp_index = CompIndex.load(DEFAULT_COMP_INDEX_PATH)
+        except FileNotFoundError:
+            self.comp_index = None
+            print(f"No comp index at '{DEFAULT_COMP_INDEX_PATH}', historical win rates disabled")
+        except ValueError as e:
+            # e.g. an index written by an older version; rebuild it with comp_index.py
+            self.comp_index = None
+            print(f"Could not load the comp index, historical win rates disabled: {e}")
 
     def create_widgets(self):
         # Main header
@@ -239,6 +321,17 @@ class ValorantMatchPredictor(tk.Tk):
                                     font=self.content_font)
         map_dropdown.pack(side=tk.LEFT, padx=10, pady=10)
 
+        symmetric_cb = tk.Checkbutton(map_frame, text="Symmetric prediction",
+                                      variable=self.symmetric_predictions,
+                                      command=self.symmetric_toggled,
+                                      bg=self.valorant_blue,
+                                      fg=self.valorant_white,
+                                      selectcolor=self.valorant_blue,
+                                      activebackground=self.valorant_blue,
+                                      activeforeground=self.valorant_white,
+                                      font=self.content_font)
+        symmetric_cb.pack(side=tk.LEFT, padx=10, pady=10)
+
         # Start button
         start_button = tk.Button(map_frame, text="START MATCH",
                                  command=self.start_match,
@@ -248,6 +341,26 @@ class ValorantMatchPredictor(tk.Tk):
                                  padx=15, pady=5)
         start_button.pack(side=tk.RIGHT, padx=20, pady=10)
 
+        suggest_button = tk.Button(map_frame, text="SUGGEST PICKS",
+                                   command=self.suggest_picks,
+                                   bg="#333333", fg=self.valorant_white,
+                                   font=self.subtitle_font,
+                                   relief=tk.FLAT,
+                                   padx=15, pady=5)
+        suggest_button.pack(side=tk.RIGHT, padx=10, pady=10)
+
+        # Draft assistant results
+        draft_frame = tk.LabelFrame(self.setup_tab, text="Best Picks",
+                                    font=self.subtitle_font,
+                                    fg=self.valorant_white, bg=self.valorant_blue)
+        draft_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=10, pady=5)
+
+        self.draft_var = tk.StringVar(value="Lock agents for both teams and press SUGGEST PICKS")
+        draft_label = tk.Label(draft_frame, textvariable=self.draft_var,
+                               font=self.content_font, justify=tk.LEFT,
+                               fg=self.valorant_white, bg=self.valorant_blue)
+        draft_label.pack(side=tk.LEFT, padx=10, pady=5)
+
         # Configure the canvas to update scroll region when frame size changes
         team1_frame.bind("<Configure>", lambda e: team1_canvas.configure(
             scrollregion=team1_canvas.bbox("all")))
@@ -309,6 +422,7 @@ class ValorantMatchPredictor(tk.Tk):
         self.team1_bar = tk.Canvas(self.probability_frame, height=30, bg="#333333",
                                    highlightthickness=0)
         self.team1_bar.pack(fill=tk.X, padx=20, pady=5)
+        self.team1_bar_rect = self.team1_bar.create_rectangle(0, 0, 0, 30, fill=self.valorant_red, outline="")
 
         # Team 2 probability
         team2_prob_frame = tk.Frame(self.probability_frame, bg=self.valorant_blue)
@@ -329,6 +443,19 @@ class ValorantMatchPredictor(tk.Tk):
         self.team2_bar = tk.Canvas(self.probability_frame, height=30, bg="#333333",
                                    highlightthickness=0)
         self.team2_bar.pack(fill=tk.X, padx=20, pady=5)
+        self.team2_bar_rect = self.team2_bar.create_rectangle(0, 0, 0, 30, fill=self.valorant_red, outline="")
+
+        # Bars are drawn as a share of the canvas width, so redraw them whenever it changes
+        self.bar_probabilities = (0, 0)
+        self.team1_bar.bind("<Configure>", lambda e: self.update_probability_bars(*self.bar_probabilities))
+        self.team2_bar.bind("<Configure>", lambda e: self.update_probability_bars(*self.bar_probabilities))
+
+        # Historical record of both comps and of this exact matchup
+        self.history_var = tk.StringVar(value="")
+        history_label = tk.Label(prediction_frame, textvariable=self.history_var,
+                                 font=self.content_font, justify=tk.LEFT,
+                                 fg=self.valorant_white, bg=self.valorant_blue)
+        history_label.pack(pady=5)
 
         # Round controls
         controls_frame = tk.Frame(self.prediction_tab, bg=self.valorant_blue)
@@ -375,6 +502,9 @@ class ValorantMatchPredictor(tk.Tk):
             messagebox.showwarning("Warning", "Please select less than 6 agents for Team 2!")
             return
 
+        if not self.check_model(self.selected_map.get()):
+            return
+
         # Reset scores and round
         self.round_number = 1
         self.team1_score = 0
@@ -383,27 +513,145 @@ class ValorantMatchPredictor(tk.Tk):
         # Update UI
         self.update_score_display()
 
+        # Score every reachable state up front so each round is a table lookup
+        self.build_probability_table()
+
         # Make initial prediction
         self.make_prediction()
+        self.update_history()
 
         # Switch to prediction tab
         self.notebook.select(self.prediction_tab)
 
+    def suggest_picks(self):
+        team1_locked = [agent for agent, var in self.team1_vars.items() if var.get()]
+        team2_locked = [agent for agent, var in self.team2_vars.items() if var.get()]
+        if len(team1_locked) > 5 or len(team2_locked) > 5:
+            messagebox.showwarning("Warning", "Please select at most 5 agents per team!")
+            return
+        if not self.check_model(self.selected_map.get()):
+            return
+
+        # Ranking scores up to tens of thousands of drafts, so it runs on the worker
+        map_name, symmetric = self.selected_map.get(), self.symmetric_predictions.get()
+        self.draft_var.set("Ranking picks...")
+        self.prediction_worker.submit("draft", lambda: self.rank_picks(team1_locked, team2_locked, map_name,
+                                                                        symmetric))
+
+    def rank_picks(self, team1_locked, team2_locked, map_name, symmetric):
+        # Runs on the worker thread, the only user of draft_assistant once the UI is up.
+        # A new routed model gets a new assistant, and with it an empty cache
+        model, encoder = self.model_for(map_name)
+        if self.draft_assistant is None or self.draft_assistant.model is not model:
+            self.draft_assistant = DraftAssistant(model, encoder)
+        return self.draft_assistant.rank_picks(team1_locked, team2_locked, map_name, top_k=5,
+                                               swap=encoder.swap_permutation if symmetric else None)
+
+    def show_picks(self, ranked):
+        # Probabilities are each pick's worst case against the other team's options
+        lines = []
+        for team, label in (("team1", "Team 1"), ("team2", "Team 2")):
+            picks = ranked[team]
+            if not picks:
+                lines.append(f"{label}: team complete")
+                continue
+            lines.append(f"{label}: " + ", ".join(
+                f"{' + '.join(agent.capitalize() for agent in agents)} {100 * proba:.1f}%"
+                for agents, proba in picks))
+        self.draft_var.set("\n".join(lines))
+
+    def symmetric_toggled(self):
+        # Rescore the running match in the new mode, so it never shows a mix of both
+        if self.team1_agents:
+            self.prediction_worker.cancel("state")
+            self.build_probability_table()
+            self.make_prediction()
+
     def update_score_display(self):
         self.round_label.config(text=f"Round: {self.round_number}")
         self.team1_score_label.config(text=f"Team 1: {self.team1_score}")
         self.team2_score_label.config(text=f"Team 2: {self.team2_score}")
 
+    def build_probability_table(self):
+        # Scored on the worker; the arguments are copied so it never reads state the UI is changing
+        self.probability_table = None
+        self.table_pending = True
+        team1_agents, team2_agents = list(self.team1_agents), list(self.team2_agents)
+        map_name, symmetric = self.selected_map.get(), self.symmetric_predictions.get()
+        self.prediction_worker.submit("table", lambda: self.score_probability_table(
+            team1_agents, team2_agents, map_name, symmetric))
+
+    def score_probability_table(self, team1_agents, team2_agents, map_name, symmetric):
+        # Runs on the worker thread. Compositions and map are fixed for the match,
+        # so only the score columns vary. The swap comes from the same encoder as the rows
+        model, encoder = self.model_for(map_name)
+        swap = encoder.swap_permutation if symmetric else None
+        size = self.max_table_score + 1
+        team1_scores, team2_scores = np.divmod(np.arange(size * size), size)
+
+        base_row = encoder.encode(team1_agents, team2_agents, map_name, 1, 0, 0)
+        input_rows = np.repeat(base_row, size * size, axis=0)
+        input_rows[:, encoder.round_col] = team1_scores + team2_scores + 1
+        input_rows[:, encoder.team1_score_col] = team1_scores
+        input_rows[:, encoder.team2_score_col] = team2_scores
+
+        # One batched call for the whole match (both orientations in symmetric mode)
+        win_proba = predict_win_proba(model, input_rows, swap=swap) * 100
+        return win_proba.reshape(size, size)
+
+    def score_state(self, team1_agents, team2_agents, map_name, round_number, team1_score, team2_score,
+                    symmetric):
+        # Runs on the worker thread
+        model, encoder = self.model_for(map_name)
+        swap = encoder.swap_permutation if symmetric else None
+        input_row = encoder.encode(team1_agents, team2_agents, map_name, round_number, team1_score, team2_score)
+        return predict_win_proba(model, input_row, swap=swap)[0] * 100
+
     def make_prediction(self):
-        # Format input data
-        input_df = self.format_input(self.team1_agents, self.team2_agents,
-                                     self.selected_map.get(),
-                                     self.round_number,
-                                     self.team1_score,
-                                     self.team2_score)
-
-        # Make prediction
-        win_proba_team1 = self.rf_model.predict_proba(input_df)[0][1] * 100
+        in_table = self.team1_score <= self.max_table_score and self.team2_score <= self.max_table_score
+        if self.probability_table is not None and in_table:
+            # A single-state request still in flight is older than this, so drop it
+            self.prediction_worker.cancel("state")
+            self.show_prediction(self.probability_table[self.team1_score, self.team2_score])
+        elif self.table_pending and in_table:
+            # The table is on its way and will show this state when it lands
+            self.prediction_worker.cancel("state")
+        else:
+            # Outside the precomputed window, score this state directly; a newer
+            # click replaces it if the worker hasn't started on it yet
+            state = (list(self.team1_agents), list(self.team2_agents), self.selected_map.get(),
+                     self.round_number, self.team1_score, self.team2_score, self.symmetric_predictions.get())
+            self.prediction_worker.submit("state", lambda: self.score_state(*state))
+
+    def notify_prediction_ready(self):
+        # Called from the worker thread; event_generate is the safe way back into Tk
+        try:
+            self.event_generate("<<PredictionReady>>", when="tail")
+        except (tk.TclError, RuntimeError):
+            # The window is gone
+            pass
+
+    def on_prediction_ready(self, event=None):
+        for key, result, error in self.prediction_worker.results():
+            if error is not None:
+                if key == "table":
+                    self.table_pending = False
+                if key == "draft" and isinstance(error, ValueError):
+                    # e.g. a team with more open slots than the ranking can cover
+                    self.draft_var.set("")
+                    messagebox.showwarning("Warning", str(error))
+                else:
+                    messagebox.showerror("Error", f"Prediction failed: {error}")
+            elif key == "table":
+                self.probability_table = result
+                self.table_pending = False
+                self.make_prediction()
+            elif key == "draft":
+                self.show_picks(result)
+            else:
+                self.show_prediction(result)
+
+    def show_prediction(self, win_proba_team1):
         win_proba_team2 = 100 - win_proba_team1
 
         # Update UI with predictions
@@ -413,25 +661,33 @@ class ValorantMatchPredictor(tk.Tk):
         # Update probability bars
         self.update_probability_bars(win_proba_team1, win_proba_team2)
 
-    def update_probability_bars(self, team1_prob, team2_prob):
-        bar_width = self.team1_bar.winfo_width()
-        if bar_width <= 1:  # If not yet properly sized, wait a bit and retry
-            self.after(100, lambda: self.update_probability_bars(team1_prob, team2_prob))
+    def update_history(self):
+        if self.comp_index is None:
+            self.history_var.set("History: no comp index (build one with comp_index.py)")
             return
 
-        # Clear existing bars
-        self.team1_bar.delete("all")
-        self.team2_bar.delete("all")
+        def record(games, wins):
+            if not games:
+                return "no games"
+            return f"{wins:g}-{games - wins:g} ({100 * wins / games:.1f}%)"
+
+        map_name = self.selected_map.get()
+        lines = []
+        for label, map_filter in ((map_name, map_name), ("all maps", None)):
+            team1 = record(*self.comp_index.comp_stats(self.team1_agents, map_filter))
+            team2 = record(*self.comp_index.comp_stats(self.team2_agents, map_filter))
+            head_to_head = record(*self.comp_index.matchup_stats(self.team1_agents, self.team2_agents, map_filter))
+            lines.append(f"History on {label}: Team 1 comp {team1}, Team 2 comp {team2}, "
+                         f"Team 1 vs Team 2 {head_to_head}")
+        self.history_var.set("\n".join(lines))
 
-        # Draw team 1 bar
-        team1_width = int(bar_width * team1_prob / 100)
-        self.team1_bar.create_rectangle(0, 0, team1_width, 30,
-                                        fill=self.valorant_red, outline="")
-
-        # Draw team 2 bar
-        team2_width = int(bar_width * team2_prob / 100)
-        self.team2_bar.create_rectangle(0, 0, team2_width, 30,
-                                        fill=self.valorant_red, outline="")
+    def update_probability_bars(self, team1_prob, team2_prob):
+        # Move the existing rectangles; before the canvases are sized the width is 1,
+        # and their <Configure> binding redraws with the stored probabilities
+        self.bar_probabilities = (team1_prob, team2_prob)
+        for bar, rect, prob in ((self.team1_bar, self.team1_bar_rect, team1_prob),
+                                (self.team2_bar, self.team2_bar_rect, team2_prob)):
+            bar.coords(rect, 0, 0, int(bar.winfo_width() * prob / 100), 30)
 
     def team1_won(self):
         self.team1_score += 1
@@ -450,30 +706,10 @@ class ValorantMatchPredictor(tk.Tk):
         self.notebook.select(self.setup_tab)
 
     def format_input(self, team1_agents, team2_agents, map_to_predict, round_number, team1_score, team2_score):
-        # One-hot encode agents for both teams
-        team1_encoded = {f'team1_{agent}': 1 if agent in team1_agents else 0 for agent in self.all_agents}
-        team2_encoded = {f'team2_{agent}': 1 if agent in team2_agents else 0 for agent in self.all_agents}
-
-        # One-hot encode map
-        map_encoded = {f"Map_{m}": 1 if m == map_to_predict else 0 for m in self.all_maps}
-
-        # Combine into a single row
-        input_row = {
-            'RoundNumber': round_number,
-            'Team1_RoundScore': team1_score,
-            'Team2_RoundScore': team2_score,
-            **team1_encoded,
-            **team2_encoded,
-            **map_encoded
-        }
-
-        # Convert to DataFrame and ensure correct column order
-        input_df = pd.DataFrame([input_row])
-        for col in self.expected_column_order:
-            if col not in input_df.columns:
-                input_df[col] = 0
-        input_df = input_df[self.expected_column_order]
-        return input_df
+        # Encode into a (1, n_features) row in expected_column_order. The row is the
+        # encoder's reusable buffer, so it is only valid until the next call
+        return self.encoder.encode(team1_agents, team2_agents, map_to_predict,
+                                   round_number, team1_score, team2_score)
 
 
 if __name__ == "__main__":
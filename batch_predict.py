@@ -0,0 +1,185 @@
+"""Headless batch scoring of match states.
+
+Streams a CSV, Parquet or JSONL file of match states in chunks, scores each
+chunk with one predict_proba call and appends the probabilities to the output
+file, so memory stays bounded by the chunk size rather than the input size.
+
+Input columns:
+    team1_agents, team2_agents  agent names, either lists (JSONL/Parquet) or
+                                strings joined by --agent-separator
+    map                         map name, e.g. "Ascent"
+    round_number                current round number
+    team1_score, team2_score    round scores
+
+Usage:
+    python batch_predict.py states.csv probabilities.csv --chunk-size 200000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from feature_encoder import FeatureEncoder
+from valorant_model import load_predictor, predict_win_proba
+
+INPUT_COLUMNS = ['team1_agents', 'team2_agents', 'map', 'round_number', 'team1_score', 'team2_score']
+
+
+def detect_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.csv', '.txt'):
+        return 'csv'
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    if ext in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    raise ValueError(f"Can't infer file format from '{path}', pass --input-format/--output-format")
+
+
+def read_chunks(path, fmt, chunk_size, keep_columns=()):
+    columns = INPUT_COLUMNS + [c for c in keep_columns if c not in INPUT_COLUMNS]
+    if fmt == 'csv':
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+    elif fmt == 'jsonl':
+        for chunk in pd.read_json(path, lines=True, chunksize=chunk_size):
+            yield chunk[columns]
+    elif fmt == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading Parquet files requires pyarrow (pip install pyarrow)")
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unknown input format '{fmt}'")
+
+
+def agent_codes(encoder, agents, separator):
+    # Map a column of agent lists/strings to an (n, 5) code matrix, -1 padded
+    if not len(agents) or not isinstance(agents.iloc[0], (list, tuple, np.ndarray)):
+        agents = agents.fillna('').astype(str).str.lower().str.split(separator)
+    # Expanding to one column per slot lets the name lookup run per column, not per row
+    slots = pd.DataFrame(agents.tolist(), index=agents.index)
+    codes = np.full((len(agents), max(slots.shape[1], 1)), -1, dtype=np.intp)
+    for i, col in enumerate(slots.columns):
+        codes[:, i] = slots[col].astype(object).str.strip().map(encoder.agent_codes).fillna(-1).to_numpy(dtype=np.intp)
+    return codes
+
+
+def encode_chunk(encoder, chunk, separator, out=None):
+    return encoder.encode_codes(
+        agent_codes(encoder, chunk['team1_agents'], separator),
+        agent_codes(encoder, chunk['team2_agents'], separator),
+        chunk['map'].map(encoder.map_codes).fillna(-1).to_numpy(dtype=np.intp),
+        chunk['round_number'].to_numpy(),
+        chunk['team1_score'].to_numpy(),
+        chunk['team2_score'].to_numpy(),
+        out=out,
+    )
+
+
+class ChunkWriter:
+    # Appends result frames to the output file one chunk at a time
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self._parquet_writer = None
+        self._handle = None
+
+    def write(self, df):
+        if self.fmt == 'csv':
+            if self._handle is None:
+                self._handle = open(self.path, 'w', newline='')
+                df.to_csv(self._handle, index=False)
+            else:
+                df.to_csv(self._handle, index=False, header=False)
+        elif self.fmt == 'jsonl':
+            if self._handle is None:
+                self._handle = open(self.path, 'w')
+            df.to_json(self._handle, orient='records', lines=True, double_precision=15)
+        elif self.fmt == 'parquet':
+            try:
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+            except ImportError:
+                raise ImportError("Writing Parquet files requires pyarrow (pip install pyarrow)")
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            raise ValueError(f"Unknown output format '{self.fmt}'")
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def score_file(input_path, output_path, model, encoder, chunk_size=100_000,
+               input_format=None, output_format=None, separator=',', keep_columns=(), symmetric=False):
+    input_format = input_format or detect_format(input_path)
+    output_format = output_format or detect_format(output_path)
+
+    swap = encoder.swap_permutation if symmetric else None
+    # One feature buffer reused for every chunk
+    buffer = np.zeros((chunk_size, encoder.n_features), dtype=encoder.dtype)
+    writer = ChunkWriter(output_path, output_format)
+    total_rows = 0
+    try:
+        for chunk in read_chunks(input_path, input_format, chunk_size, keep_columns):
+            X = encode_chunk(encoder, chunk, separator, out=buffer)
+            win_proba = predict_win_proba(model, X, swap=swap)
+
+            result = chunk[list(keep_columns)].reset_index(drop=True)
+            result['team1_win_probability'] = win_proba
+            result['team2_win_probability'] = 1 - win_proba
+            writer.write(result)
+            total_rows += len(chunk)
+    finally:
+        writer.close()
+    return total_rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a file of Valorant match states without the UI.")
+    parser.add_argument('input', help="CSV, Parquet or JSONL file of match states")
+    parser.add_argument('output', help="where to write the probabilities (format from extension)")
+    parser.add_argument('--model', help="model artifact, compiled .npz or pickle "
+                                        "(default: the .valmodel artifact if present, else the pickle)")
+    parser.add_argument('--chunk-size', type=int, default=100_000,
+                        help="rows read, encoded and scored per batch")
+    parser.add_argument('--input-format', choices=['csv', 'parquet', 'jsonl'])
+    parser.add_argument('--output-format', choices=['csv', 'parquet', 'jsonl'])
+    parser.add_argument('--agent-separator', default=',',
+                        help="separator used when agents are stored as one string")
+    parser.add_argument('--keep-columns', nargs='*', default=[],
+                        help="input columns copied to the output, e.g. an ID column")
+    parser.add_argument('--symmetric', action='store_true',
+                        help="average each row with its team-swapped mirror (one doubled batch per chunk)")
+    args = parser.parse_args(argv)
+
+    model, columns, agents, maps = load_predictor(args.model)
+    encoder = FeatureEncoder(agents, maps, columns)
+
+    start = time.perf_counter()
+    total_rows = score_file(args.input, args.output, model, encoder,
+                            chunk_size=args.chunk_size,
+                            input_format=args.input_format,
+                            output_format=args.output_format,
+                            separator=args.agent_separator,
+                            keep_columns=args.keep_columns,
+                            symmetric=args.symmetric)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {total_rows} rows in {elapsed:.2f}s "
+          f"({total_rows / max(elapsed, 1e-9):,.0f} rows/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Benchmark suite for model loading, feature encoding, prediction and data prep.
+
+Runs on synthetic data built from the real agent and map vocabularies, so
+neither the Kaggle database nor the shipped model is needed: a SQLite file
+with the notebook's tables and a GradientBoostingClassifier trained on it
+are generated in a temporary directory (or --model benchmarks an existing
+pickle). Results are written as JSON; --compare prints the change against
+an earlier run, e.g. from another commit.
+
+Usage:
+    python benchmarks.py --out bench.json
+    python benchmarks.py --out new.json --compare bench.json
+    python benchmarks.py --model gradient_boosting_model2.pkl --profile
+"""
+import argparse
+import json
+import os
+import pickle
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from feature_encoder import ALL_AGENTS, ALL_MAPS, FeatureEncoder
+from valorant_model import load_model, schema_from_model
+
+DEFAULT_BATCH_SIZES = (1, 16, 256, 4096)
+
+
+def make_synthetic_db(path, n_games=2000, seed=0):
+    """Write a SQLite file with the Games, Game_Rounds and Game_Scoreboard tables the notebook reads."""
+    rng = random.Random(seed)
+    teams = [f'T{i:02d}' for i in range(40)]
+    # Real maps only; TBD is a placeholder in the Kaggle data
+    maps = [m for m in ALL_MAPS if m != 'TBD']
+    games, rounds, scoreboard = [], [], []
+    for game in range(n_games):
+        game_id = str(100_000 + game)
+        team1, team2 = rng.sample(teams, 2)
+        # Play rounds until someone reaches 13 with a two-round lead
+        team1_score = team2_score = 0
+        history = {}
+        while max(team1_score, team2_score) < 13 or abs(team1_score - team2_score) < 2:
+            team1_won = rng.random() < 0.5
+            team1_score += team1_won
+            team2_score += not team1_won
+            history[len(history) + 1] = {'RoundWinner': team1 if team1_won else team2,
+                                         'ScoreAfterRound': f'{team1_score}-{team2_score}',
+                                         'WinType': 'Elim', 'Team1Bank': 0, 'Team2Bank': 0}
+        winner = team1 if team1_score > team2_score else team2
+        games.append((game_id, str(game // 2), rng.choice(maps), team1 + 'id', team2 + 'id', team1, team2, winner))
+        rounds.append((game_id, team1 + 'id', team2 + 'id', repr(history)))
+        for team in (team1, team2):
+            for player, agent in enumerate(rng.sample(ALL_AGENTS, 5)):
+                scoreboard.append((game_id, f'{team}{player}', f'{team}{player}', team, agent))
+
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("CREATE TABLE Games (GameID TEXT, MatchID TEXT, Map TEXT, Team1ID TEXT, Team2ID TEXT, "
+                     "Team1 TEXT, Team2 TEXT, Winner TEXT)")
+        conn.execute("CREATE TABLE Game_Rounds (GameID TEXT, Team1ID TEXT, Team2ID TEXT, RoundHistory TEXT)")
+        conn.execute("CREATE TABLE Game_Scoreboard (GameID TEXT, PlayerID TEXT, PlayerName TEXT, "
+                     "TeamAbbreviation TEXT, Agent TEXT)")
+        conn.executemany("INSERT INTO Games VALUES (?, ?, ?, ?, ?, ?, ?, ?)", games)
+        conn.executemany("INSERT INTO Game_Rounds VALUES (?, ?, ?, ?)", rounds)
+        conn.executemany("INSERT INTO Game_Scoreboard VALUES (?, ?, ?, ?, ?)", scoreboard)
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+def read_tables(db_path):
+    # The notebook's first cell: every table it uses, read whole
+    conn = sqlite3.connect(db_path)
+    try:
+        return {table: pd.read_sql_query(f"SELECT * FROM {table}", conn)
+                for table in ('Games', 'Game_Rounds', 'Game_Scoreboard')}
+    finally:
+        conn.close()
+
+
+def build_training_matrix(tables, rounds_df):
+    from round_matrix import build_round_matrix
+    from team_pairing import pair_games
+
+    paired = pair_games(tables['Game_Scoreboard'], tables['Games'], agents=ALL_AGENTS)
+    return build_round_matrix(paired, rounds_df, maps=ALL_MAPS)
+
+
+def train_synthetic_model(db_path, path, n_estimators=100, seed=0):
+    """Fit the shipped model's kind of GradientBoostingClassifier on the synthetic games and pickle it."""
+    from sklearn.ensemble import GradientBoostingClassifier
+
+    from round_matrix import swap_augment
+    from round_parser import parse_round_histories
+
+    matrix = build_training_matrix(read_tables(db_path), parse_round_histories(db_path, workers=0).to_frame())
+    rows = swap_augment(matrix, 'random', seed)
+    model = GradientBoostingClassifier(n_estimators=n_estimators, max_depth=3, random_state=seed)
+    # A DataFrame, so the pickle carries its column order like the notebook's model
+    model.fit(pd.DataFrame(rows.to_dense(), columns=matrix.columns), rows.y)
+    with open(path, 'wb') as f:
+        pickle.dump(model, f)
+    return path
+
+
+def random_states(n, seed=0):
+    rng = random.Random(seed)
+    states = []
+    for _ in range(n):
+        team1_score, team2_score = rng.randint(0, 12), rng.randint(0, 12)
+        states.append((rng.sample(ALL_AGENTS, 5), rng.sample(ALL_AGENTS, 5), rng.choice(ALL_MAPS),
+                       team1_score + team2_score + 1, team1_score, team2_score))
+    return states
+
+
+def measure(fn, repeat=7, min_seconds=0.05, rows=1):
+    """Time fn() like timeit: loops per repeat grow until a repeat takes min_seconds.
+
+    Returns per-call milliseconds (median, mean, min, max) and rows per second.
+    """
+    fn()  # warm-up
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_seconds / elapsed) + 1))
+
+    per_call = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        per_call.append((time.perf_counter() - start) / loops)
+    per_call_ms = np.array(per_call) * 1000
+    median = float(np.median(per_call_ms))
+    return {'median_ms': median, 'mean_ms': float(per_call_ms.mean()),
+            'min_ms': float(per_call_ms.min()), 'max_ms': float(per_call_ms.max()),
+            'loops': loops, 'repeat': repeat, 'rows': rows,
+            'rows_per_s': rows / (median / 1000) if median else float('inf')}
+
+
+def run_suite(workdir, model_path=None, n_games=2000, batch_sizes=DEFAULT_BATCH_SIZES, repeat=7, seed=0,
+              log=print):
+    """Run every benchmark and return {name: timings}."""
+    from compiled_model import compile_model
+    from model_artifact import save_artifact
+    from round_parser import parse_round_histories
+
+    results = {}
+
+    def bench(name, fn, rows=1, **kwargs):
+        results[name] = measure(fn, rows=rows, **kwargs)
+        log(f"{name:<32} {results[name]['median_ms']:>10.4f} ms")
+
+    db_path = make_synthetic_db(os.path.join(workdir, 'synthetic.sqlite'), n_games, seed)
+    if model_path is None:
+        log(f"Training a synthetic model on {n_games} games")
+        model_path = train_synthetic_model(db_path, os.path.join(workdir, 'synthetic_model.pkl'), seed=seed)
+
+    # Model load, for each format the model can be saved in
+    bench('load_model/pickle', lambda: load_model(model_path), repeat=repeat)
+    model = load_model(model_path)
+    columns, agents, maps = schema_from_model(model)
+    compiled = None
+    try:
+        compiled = compile_model(model)
+    except (AttributeError, ValueError) as e:
+        log(f"Skipping the compiled model: {e}")
+    if compiled is not None:
+        compiled_path = os.path.join(workdir, 'model.npz')
+        artifact_path = os.path.join(workdir, 'model.valmodel')
+        compiled.save(compiled_path)
+        save_artifact(artifact_path, compiled, columns, agents, maps)
+        bench('load_model/compiled', lambda: load_model(compiled_path), repeat=repeat)
+        bench('load_model/artifact', lambda: load_model(artifact_path), repeat=repeat)
+
+    # Encoding: the UI's format_input is a single encode() call
+    encoder = FeatureEncoder(sorted(agents), maps, columns)
+    states = random_states(max(batch_sizes), seed)
+    team1, team2, map_name, round_number, team1_score, team2_score = states[0]
+    bench('format_input', lambda: encoder.encode(team1, team2, map_name, round_number, team1_score, team2_score),
+          repeat=repeat)
+    for n in batch_sizes:
+        bench(f'encode_many/{n}', lambda n=n: encoder.encode_many(states[:n]), rows=n, repeat=repeat)
+
+    # predict_proba, single rows and batches
+    X = encoder.encode_many(states)
+    models = {'sklearn': model}
+    if compiled is not None:
+        models['compiled'] = compiled
+    for kind, predictor in models.items():
+        for n in batch_sizes:
+            bench(f'predict_proba/{kind}/{n}', lambda p=predictor, n=n: p.predict_proba(X[:n]), rows=n, repeat=repeat)
+
+    # The notebook's data prep: reading the tables, parsing round histories, pairing and merging
+    prep_repeat = max(3, repeat // 2)
+    bench('prep/sqlite_load', lambda: read_tables(db_path), rows=n_games, repeat=prep_repeat)
+    bench('prep/parse_rounds', lambda: parse_round_histories(db_path, workers=0), rows=n_games, repeat=prep_repeat)
+    tables = read_tables(db_path)
+    rounds_df = parse_round_histories(db_path, workers=0).to_frame()
+    bench('prep/merge', lambda: build_training_matrix(tables, rounds_df), rows=n_games, repeat=prep_repeat)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    import sklearn
+    return {'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': commit or None,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'sklearn': sklearn.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()}
+
+
+def compare(previous, current):
+    """Lines with each benchmark's median before and after, slower runs marked."""
+    lines = []
+    for name, result in current['results'].items():
+        old = previous['results'].get(name)
+        if old is None:
+            lines.append(f"{name:<32} {'new':>10} -> {result['median_ms']:.4f} ms")
+            continue
+        change = result['median_ms'] / old['median_ms'] - 1 if old['median_ms'] else 0.0
+        flag = '  SLOWER' if change > 0.1 else ''
+        lines.append(f"{name:<32} {old['median_ms']:>10.4f} -> {result['median_ms']:.4f} ms ({change:+.1%}){flag}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark model loading, encoding, prediction and data prep.")
+    parser.add_argument('--out', default='benchmark_results.json', help="where to write the JSON results")
+    parser.add_argument('--compare', help="earlier results JSON to compare against")
+    parser.add_argument('--model', help="pickled model to benchmark (default: train one on the synthetic data)")
+    parser.add_argument('--games', type=int, default=2000, help="synthetic games to generate")
+    parser.add_argument('--batch-sizes', default=','.join(map(str, DEFAULT_BATCH_SIZES)),
+                        help="comma-separated batch sizes for encoding and prediction")
+    parser.add_argument('--repeat', type=int, default=7, help="timed repeats per benchmark")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profile', action='store_true',
+                        help="also record the per-stage profiling hooks and include them in the output")
+    args = parser.parse_args(argv)
+
+    batch_sizes = [int(n) for n in args.batch_sizes.split(',')]
+    if args.profile:
+        profiling.enable()
+    with tempfile.TemporaryDirectory() as workdir:
+        results = run_suite(workdir, model_path=args.model, n_games=args.games, batch_sizes=batch_sizes,
+                            repeat=args.repeat, seed=args.seed)
+
+    report = {'environment': environment(),
+              'config': {'games': args.games, 'batch_sizes': batch_sizes, 'repeat': args.repeat,
+                         'seed': args.seed, 'model': args.model},
+              'results': results}
+    if args.profile:
+        report['profile'] = profiling.snapshot()
+    tmp_path = args.out + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(report, f, indent=1)
+    os.replace(tmp_path, args.out)
+    print(f"Results written to '{args.out}'")
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        print('\n'.join(compare(previous, report)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Prebuilt win-rate index for team compositions and comp-vs-comp matchups.
+
+Each composition is keyed by a bitmask with one bit per agent (bit i for the
+i-th agent in sorted order), optionally combined with a map. Games and wins
+are stored for every comp and every pair of comps, over all maps and per map,
+in open-addressing hash tables. The tables are saved as .npy files and
+memory-mapped on load, so a lookup touches a couple of slots instead of
+scanning the scoreboard.
+
+Usage:
+    python comp_index.py data/valorant.sqlite --out comp_index
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from team_pairing import pair_games
+
+DEFAULT_COMP_INDEX_PATH = 'comp_index'
+INDEX_FORMAT_VERSION = 1
+
+# Keys pack map (8 bits) and one or two comp masks into a uint64
+MAP_BITS = 8
+MAX_AGENTS = (64 - MAP_BITS) // 2
+EMPTY = np.uint64(0xFFFFFFFFFFFFFFFF)
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _hash_slots(keys, capacity):
+    # Fibonacci hashing: the high bits of key * golden ratio pick the slot
+    with np.errstate(over='ignore'):
+        return ((keys * HASH_MULTIPLIER) >> np.uint64(64 - int(capacity).bit_length() + 1)).astype(np.int64)
+
+
+def build_hash_table(keys, values):
+    """Lay out unique uint64 keys in a linear-probing table at most half full."""
+    capacity = 1 << max(3, int(2 * len(keys) - 1).bit_length())
+    table_keys = np.full(capacity, EMPTY, dtype=np.uint64)
+    table_values = np.zeros((capacity,) + values.shape[1:], dtype=values.dtype)
+
+    # Insert in rounds: every pending key tries its next slot, and the first
+    # key to reach a free slot takes it
+    slots = _hash_slots(keys, capacity)
+    pending = np.arange(len(keys))
+    while len(pending):
+        free = table_keys[slots[pending]] == EMPTY
+        candidates = pending[free]
+        _, first = np.unique(slots[candidates], return_index=True)
+        placed = candidates[first]
+        table_keys[slots[placed]] = keys[placed]
+        table_values[slots[placed]] = values[placed]
+
+        pending = np.setdiff1d(pending, placed, assume_unique=True)
+        slots[pending] = (slots[pending] + 1) & (capacity - 1)
+    return table_keys, table_values
+
+
+class CompIndex:
+    def __init__(self, agents, maps, comp_keys, comp_counts, matchup_keys, matchup_counts):
+        self.agents = list(agents)
+        self.maps = list(maps)
+        self.agent_bits = {agent: 1 << i for i, agent in enumerate(self.agents)}
+        # Map code 0 means all maps
+        self.map_codes = {m: i + 1 for i, m in enumerate(self.maps)}
+        # Hash tables: uint64 keys and (games, wins) counts
+        self.comp_keys = comp_keys
+        self.comp_counts = comp_counts
+        self.matchup_keys = matchup_keys
+        self.matchup_counts = matchup_counts
+
+    def comp_mask(self, agents):
+        """Canonical bitmask of a composition; None if it has an agent the index has never seen."""
+        mask = 0
+        for agent in agents:
+            bit = self.agent_bits.get(agent)
+            if bit is None:
+                return None
+            mask |= bit
+        return mask
+
+    def _map_code(self, map_name):
+        if map_name is None:
+            return 0
+        return self.map_codes.get(map_name)
+
+    def _lookup(self, table_keys, table_counts, key):
+        capacity = len(table_keys)
+        # Same hash as _hash_slots, on a Python int
+        slot = ((key * int(HASH_MULTIPLIER)) & 0xFFFFFFFFFFFFFFFF) >> (65 - capacity.bit_length())
+        while True:
+            stored = int(table_keys[slot])
+            if stored == key:
+                return int(table_counts[slot, 0]), int(table_counts[slot, 1])
+            if stored == int(EMPTY):
+                return 0, 0
+            slot = (slot + 1) & (capacity - 1)
+
+    def comp_stats(self, agents, map_name=None):
+        """(games, wins) for a composition, over all maps or on one map."""
+        mask, map_code = self.comp_mask(agents), self._map_code(map_name)
+        if mask is None or map_code is None:
+            return 0, 0
+        return self._lookup(self.comp_keys, self.comp_counts, (mask << MAP_BITS) | map_code)
+
+    def matchup_stats(self, agents, opponent_agents, map_name=None):
+        """(games, wins) of `agents` against `opponent_agents`, over all maps or on one map.
+
+        A mirror matchup is always won by the same comp, so it reports half the games as wins.
+        """
+        mask, other = self.comp_mask(agents), self.comp_mask(opponent_agents)
+        map_code = self._map_code(map_name)
+        if mask is None or other is None or map_code is None:
+            return 0, 0
+        # Pairs are stored once, with the wins of the lower mask
+        low, high = min(mask, other), max(mask, other)
+        games, low_wins = self._lookup(self.matchup_keys, self.matchup_counts,
+                                       (((low << MAX_AGENTS) | high) << MAP_BITS) | map_code)
+        if mask == other:
+            return games, games / 2
+        return games, low_wins if mask == low else games - low_wins
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for name in ('comp_keys', 'comp_counts', 'matchup_keys', 'matchup_counts'):
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+        # Written last, so a directory without it is an incomplete build
+        with open(os.path.join(directory, 'index.json'), 'w') as f:
+            json.dump({'version': INDEX_FORMAT_VERSION, 'agents': self.agents, 'maps': self.maps}, f)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, 'index.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != INDEX_FORMAT_VERSION:
+            raise ValueError(f"'{directory}' uses comp index format {meta.get('version')}, "
+                             f"this code reads {INDEX_FORMAT_VERSION}")
+        tables = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r')
+                  for name in ('comp_keys', 'comp_counts', 'matchup_keys', 'matchup_counts')}
+        return cls(meta['agents'], meta['maps'], **tables)
+
+
+def _aggregate(keys, wins):
+    # Sum games and wins per distinct key
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    counts = np.zeros((len(unique_keys), 2), dtype=np.uint32)
+    np.add.at(counts[:, 0], inverse, 1)
+    np.add.at(counts[:, 1], inverse, wins.astype(np.uint32))
+    return unique_keys, counts
+
+
+def build_comp_index(scoreboard, games, agents=None):
+    """Count comp and matchup results over every game pair_games() keeps."""
+    paired = pair_games(scoreboard, games, agents=agents)
+    if len(paired.agents) > MAX_AGENTS:
+        raise ValueError(f"{len(paired.agents)} agents don't fit in a comp key (limit {MAX_AGENTS})")
+    maps = paired.maps
+    if len(maps) >= 1 << MAP_BITS:
+        raise ValueError(f"{len(maps)} maps don't fit in a comp key")
+
+    bits = np.uint64(1) << np.arange(len(paired.agents), dtype=np.uint64)
+    team1 = (paired.team1_agents.astype(np.uint64) * bits).sum(axis=1, dtype=np.uint64)
+    team2 = (paired.team2_agents.astype(np.uint64) * bits).sum(axis=1, dtype=np.uint64)
+    winner1 = paired.winner1
+    map_codes = (pd.Categorical(paired.info['Map'], categories=maps).codes + 1).astype(np.uint64)
+
+    def with_maps(keys, wins, codes):
+        # Every game counts once for all maps (code 0) and, if its map is known, once for that map
+        keys = keys << np.uint64(MAP_BITS)
+        has_map = codes > 0
+        return (np.concatenate([keys, (keys | codes)[has_map]]),
+                np.concatenate([wins, wins[has_map]]))
+
+    comp_keys, comp_wins = with_maps(np.concatenate([team1, team2]),
+                                     np.concatenate([winner1, ~winner1]),
+                                     np.concatenate([map_codes, map_codes]))
+
+    low, high = np.minimum(team1, team2), np.maximum(team1, team2)
+    low_won = np.where(team1 <= team2, winner1, ~winner1)
+    matchup_keys, matchup_wins = with_maps((low << np.uint64(MAX_AGENTS)) | high, low_won, map_codes)
+
+    comp_table = build_hash_table(*_aggregate(comp_keys, comp_wins))
+    matchup_table = build_hash_table(*_aggregate(matchup_keys, matchup_wins))
+    return CompIndex(paired.agents, maps, *comp_table, *matchup_table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the comp and matchup win-rate index.")
+    parser.add_argument('database', help="path to valorant.sqlite")
+    parser.add_argument('--out', default=DEFAULT_COMP_INDEX_PATH, help="index directory")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    conn = sqlite3.connect(args.database)
+    try:
+        scoreboard = pd.read_sql_query("SELECT GameID, TeamAbbreviation, Agent FROM Game_Scoreboard", conn)
+        games = pd.read_sql_query("SELECT GameID, Map, Team1ID, Team2ID, Team1, Team2, Winner FROM Games", conn)
+    finally:
+        conn.close()
+
+    index = build_comp_index(scoreboard, games)
+    index.save(args.out)
+    n_comps = int((index.comp_keys != EMPTY).sum())
+    n_matchups = int((index.matchup_keys != EMPTY).sum())
+    print(f"Indexed {n_comps} comp and {n_matchups} matchup entries in {time.perf_counter() - start:.2f}s "
+          f"to '{args.out}'")
+
+
+if __name__ == "__main__":
+    main()
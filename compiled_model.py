@@ -0,0 +1,198 @@
+"""Flattened, pure-NumPy version of the trained GradientBoostingClassifier.
+
+Every tree is padded to a complete binary tree of the ensemble's max depth and
+stored in heap order, so the children of node i are 2i+1 and 2i+2 and no
+child pointers are needed. Distinct (feature, threshold) splits are shared
+across trees: a batch first evaluates each distinct split once per row, then
+all (row, tree) walkers descend one level at a time by table lookups. This
+skips sklearn's input validation and per-estimator dispatch, which dominate
+small batches.
+
+Usage:
+    python compiled_model.py gradient_boosting_model2.pkl gradient_boosting_model2.npz
+"""
+import argparse
+import time
+
+import numpy as np
+
+ARRAY_FIELDS = ('split_feature', 'split_threshold', 'node_split', 'leaf_value')
+
+# Padding is exponential in depth, so very deep trees are not worth flattening
+MAX_COMPILED_DEPTH = 16
+
+
+class CompiledGradientBoosting:
+    # Rows walked together; small blocks keep the split table in cache
+    block_size = 256
+
+    def __init__(self, split_feature, split_threshold, node_split, leaf_value,
+                 init_raw, classes, n_features, feature_names=None):
+        self.split_feature = split_feature
+        self.split_threshold = split_threshold
+        self.node_split = node_split
+        self.leaf_value = leaf_value
+        self.init_raw = float(init_raw)
+        self.classes_ = np.asarray(classes)
+        self.n_features_in_ = int(n_features)
+        self.feature_names_in_ = None if feature_names is None else np.asarray(feature_names, dtype=object)
+
+        self.n_trees, n_internal = node_split.shape
+        self.max_depth = int(np.log2(n_internal + 1))
+        # Offsets into the flattened per-tree tables
+        self._node_offsets = (np.arange(self.n_trees) * n_internal)[:, None]
+        self._leaf_offsets = (np.arange(self.n_trees) * leaf_value.shape[1] - n_internal)[:, None]
+        self._flat_node_split = node_split.ravel()
+        self._flat_leaf_value = leaf_value.ravel()
+        self._split_threshold_column = split_threshold[:, None]
+
+    @classmethod
+    def from_sklearn(cls, model):
+        estimators = model.estimators_
+        if estimators.shape[1] != 1:
+            raise ValueError("Only binary GradientBoostingClassifier models can be compiled")
+        depth = max(estimator.tree_.max_depth for estimator in estimators[:, 0])
+        if depth > MAX_COMPILED_DEPTH:
+            raise ValueError(f"Trees of depth {depth} are too deep to flatten (limit {MAX_COMPILED_DEPTH})")
+
+        n_trees = len(estimators)
+        n_internal = 2 ** depth - 1
+        feature = np.zeros((n_trees, n_internal), dtype=np.int32)
+        # Padding nodes always go left; both of their subtrees carry the same leaf anyway
+        threshold = np.full((n_trees, n_internal), np.inf)
+        leaf_value = np.zeros((n_trees, n_internal + 1))
+
+        for t, estimator in enumerate(estimators[:, 0]):
+            tree = estimator.tree_
+            # (sklearn node, heap position) pairs, expanded level by level
+            stack = [(0, 0)]
+            while stack:
+                node, position = stack.pop()
+                if position >= n_internal:
+                    # Bake the learning rate into the leaves
+                    leaf_value[t, position - n_internal] = tree.value[node, 0, 0] * model.learning_rate
+                    continue
+                if tree.children_left[node] == -1:
+                    # Leaf above max depth: repeat it down both sides
+                    stack.append((node, 2 * position + 1))
+                    stack.append((node, 2 * position + 2))
+                else:
+                    feature[t, position] = tree.feature[node]
+                    threshold[t, position] = tree.threshold[node]
+                    stack.append((tree.children_left[node], 2 * position + 1))
+                    stack.append((tree.children_right[node], 2 * position + 2))
+
+        # Most splits repeat across trees (every binary column splits at 0.5)
+        splits = np.stack([feature.ravel().astype(np.float64), threshold.ravel()], axis=1)
+        unique_splits, node_split = np.unique(splits, axis=0, return_inverse=True)
+
+        # Baseline log-odds from the init estimator (the class prior by default)
+        init_raw = model._raw_predict_init(np.zeros((1, model.n_features_in_), dtype=np.float32))[0, 0]
+
+        return cls(split_feature=unique_splits[:, 0].astype(np.int32),
+                   split_threshold=unique_splits[:, 1].copy(),
+                   node_split=node_split.reshape(n_trees, n_internal).astype(np.int32),
+                   leaf_value=leaf_value,
+                   init_raw=init_raw,
+                   classes=model.classes_,
+                   n_features=model.n_features_in_,
+                   feature_names=getattr(model, 'feature_names_in_', None))
+
+    def _raw_predict_block(self, X):
+        n = X.shape[0]
+        # Outcome of every distinct split for every row, (n_splits, n) flattened
+        goes_right = (X.T[self.split_feature] > self._split_threshold_column).view(np.uint8).ravel()
+
+        columns = np.arange(n)
+        position = np.zeros((self.n_trees, n), dtype=np.intp)
+        for _ in range(self.max_depth):
+            split = self._flat_node_split[self._node_offsets + position]
+            position = 2 * position + 1 + goes_right[split * n + columns]
+        return self.init_raw + self._flat_leaf_value[self._leaf_offsets + position].sum(axis=0)
+
+    def decision_function(self, X):
+        # float32 first, like sklearn, so values compare against thresholds identically
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected a 2D array with {self.n_features_in_} columns, got shape {X.shape}")
+        if not np.isfinite(X).all():
+            # GradientBoostingClassifier rejects these too
+            raise ValueError("Input X contains NaN or infinity")
+        if X.shape[0] <= self.block_size:
+            return self._raw_predict_block(X)
+        return np.concatenate([self._raw_predict_block(X[i:i + self.block_size])
+                               for i in range(0, X.shape[0], self.block_size)])
+
+    def predict_proba(self, X):
+        p = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        return np.column_stack((1.0 - p, p))
+
+    def predict(self, X):
+        return self.classes_[(self.decision_function(X) > 0).astype(int)]
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in ARRAY_FIELDS}
+
+    def metadata(self):
+        return {
+            'init_raw': self.init_raw,
+            'classes': self.classes_.tolist(),
+            'n_features': self.n_features_in_,
+            'feature_names': None if self.feature_names_in_ is None else self.feature_names_in_.tolist(),
+        }
+
+    def save(self, path):
+        meta = self.metadata()
+        np.savez(path,
+                 init_raw=np.float64(meta['init_raw']),
+                 classes=self.classes_,
+                 n_features=np.int32(meta['n_features']),
+                 feature_names=np.asarray(meta['feature_names'] or [], dtype=str),
+                 **self.arrays())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            feature_names = data['feature_names'].tolist() or None
+            return cls(**{name: data[name] for name in ARRAY_FIELDS},
+                       init_raw=data['init_raw'], classes=data['classes'],
+                       n_features=data['n_features'], feature_names=feature_names)
+
+
+def compile_model(model):
+    return CompiledGradientBoosting.from_sklearn(model)
+
+
+def max_abs_difference(model, compiled, n_samples=10_000, seed=0):
+    # Compare against sklearn on random rows shaped like real inputs
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 2, size=(n_samples, model.n_features_in_)).astype(np.float32)
+    X[:, :3] = rng.integers(0, 25, size=(n_samples, 3))
+    return float(np.abs(model.predict_proba(X) - compiled.predict_proba(X)).max())
+
+
+def main(argv=None):
+    from valorant_model import load_model
+
+    parser = argparse.ArgumentParser(description="Export a pickled GradientBoostingClassifier to flat NumPy arrays.")
+    parser.add_argument('model', help="pickled sklearn model")
+    parser.add_argument('output', help="where to write the compiled .npz")
+    parser.add_argument('--tolerance', type=float, default=1e-9,
+                        help="maximum allowed probability difference from sklearn")
+    args = parser.parse_args(argv)
+
+    model = load_model(args.model)
+    compiled = compile_model(model)
+    difference = max_abs_difference(model, compiled)
+    if difference > args.tolerance:
+        raise SystemExit(f"Compiled model differs from sklearn by {difference:.3g}, not saving")
+
+    compiled.save(args.output)
+    start = time.perf_counter()
+    CompiledGradientBoosting.load(args.output)
+    print(f"Saved {compiled.n_trees} trees / {len(compiled.split_feature)} distinct splits to {args.output} "
+          f"(max difference {difference:.3g}, loads in {(time.perf_counter() - start) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
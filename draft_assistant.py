@@ -0,0 +1,84 @@
+"""Rank the remaining agent picks of a draft by predicted win probability.
+
+Every team with fewer than five locked agents is filled with each legal
+combination of the agents it doesn't have yet. All combinations of both
+teams are encoded into one matrix and scored with a single predict_proba
+call, at the match's starting state (round 1, 0-0). When both teams still
+pick, each pick is rated by its worst case over the other team's options.
+Results are kept per (locked agents, map) in a small LRU cache, so going back
+to an earlier draft state doesn't rescore it.
+"""
+from collections import OrderedDict
+from itertools import combinations
+
+import numpy as np
+
+from valorant_model import predict_win_proba
+
+TEAM_SIZE = 5
+
+
+class DraftAssistant:
+    def __init__(self, model, encoder, cache_size=128, max_candidates=50_000):
+        self.model = model
+        self.encoder = encoder
+        self.cache_size = cache_size
+        # Largest team1 x team2 grid scored at once
+        self.max_candidates = max_candidates
+        self._cache = OrderedDict()
+
+    def _options(self, locked):
+        # Every way to complete the team, as (n_options, TEAM_SIZE) agent codes
+        codes = sorted(self.encoder.agent_codes[agent] for agent in locked)
+        if len(codes) >= TEAM_SIZE:
+            return np.array([codes[:TEAM_SIZE]], dtype=np.intp), np.zeros((1, 0), dtype=np.intp)
+        remaining = [code for code in range(len(self.encoder.all_agents)) if code not in codes]
+        picks = np.array(list(combinations(remaining, TEAM_SIZE - len(codes))), dtype=np.intp)
+        picks = picks.reshape(-1, TEAM_SIZE - len(codes))
+        return np.hstack([np.tile(codes, (len(picks), 1)).astype(np.intp), picks]), picks
+
+    def _score(self, team1_locked, team2_locked, map_name, swap):
+        team1_options, team1_picks = self._options(team1_locked)
+        team2_options, team2_picks = self._options(team2_locked)
+        n1, n2 = len(team1_options), len(team2_options)
+        if n1 * n2 > self.max_candidates:
+            raise ValueError(f"{n1 * n2} candidate drafts to score (limit {self.max_candidates}); "
+                             f"lock more agents first")
+
+        # Row i * n2 + j pairs team1 option i with team2 option j
+        X = self.encoder.encode_codes(np.repeat(team1_options, n2, axis=0),
+                                      np.tile(team2_options, (n1, 1)),
+                                      np.full(n1 * n2, self.encoder.map_codes.get(map_name, -1)),
+                                      1, 0, 0)
+        team1_proba = predict_win_proba(self.model, X, swap=swap).reshape(n1, n2)
+
+        # A pick is only as good as its worst matchup against the other team's picks
+        agents = self.encoder.all_agents
+        ranked = {}
+        for team, picks, worst_case in (('team1', team1_picks, team1_proba.min(axis=1)),
+                                        ('team2', team2_picks, (1 - team1_proba).min(axis=0))):
+            if picks.shape[1]:
+                order = np.argsort(-worst_case, kind='stable')
+                ranked[team] = [(tuple(agents[code] for code in picks[i]), float(worst_case[i])) for i in order]
+            else:
+                ranked[team] = []
+        return ranked
+
+    def rank_picks(self, team1_locked, team2_locked, map_name, top_k=5, swap=None):
+        """Return {'team1': [(picks, win_probability), ...], 'team2': [...]}, best first.
+
+        A team with five locked agents has nothing to pick and gets an empty
+        list. Agents outside the encoder's vocabulary are ignored.
+        """
+        team1_locked = frozenset(a for a in team1_locked if a in self.encoder.agent_codes)
+        team2_locked = frozenset(a for a in team2_locked if a in self.encoder.agent_codes)
+        key = (team1_locked, team2_locked, map_name, swap is not None)
+        ranked = self._cache.get(key)
+        if ranked is None:
+            ranked = self._score(team1_locked, team2_locked, map_name, swap)
+            self._cache[key] = ranked
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return {team: picks[:top_k] for team, picks in ranked.items()}
@@ -0,0 +1,189 @@
+import numpy as np
+
+import profiling
+
+# Agent and map vocabularies the shipped model was trained on
+ALL_AGENTS = sorted(['yoru', 'chamber', 'reyna', 'breach', 'cypher',
+                     'phoenix', 'sage', 'astra', 'raze', 'viper',
+                     'jett', 'brimstone', 'killjoy', 'omen', 'skye',
+                     'kayo', 'sova'])
+
+ALL_MAPS = ['Ascent', 'Bind', 'Breeze', 'Fracture', 'Haven',
+            'Icebox', 'Split', 'TBD']
+
+# Expected column order for the model
+EXPECTED_COLUMN_ORDER = ['RoundNumber', 'Team1_RoundScore', 'Team2_RoundScore', 'team1_astra',
+                         'team1_breach', 'team1_brimstone', 'team1_chamber', 'team1_cypher',
+                         'team1_jett', 'team1_kayo', 'team1_killjoy', 'team1_omen',
+                         'team1_phoenix', 'team1_raze', 'team1_reyna', 'team1_sage',
+                         'team1_skye', 'team1_sova', 'team1_viper', 'team1_yoru', 'team2_astra',
+                         'team2_breach', 'team2_brimstone', 'team2_chamber', 'team2_cypher',
+                         'team2_jett', 'team2_kayo', 'team2_killjoy', 'team2_omen',
+                         'team2_phoenix', 'team2_raze', 'team2_reyna', 'team2_sage',
+                         'team2_skye', 'team2_sova', 'team2_viper', 'team2_yoru', 'Map_Ascent',
+                         'Map_Bind', 'Map_Breeze', 'Map_Fracture', 'Map_Haven', 'Map_Icebox',
+                         'Map_Split', 'Map_TBD']
+
+
+# Column prefixes that trade places when the two teams are swapped
+SWAP_PREFIXES = (('Team1_', 'Team2_'), ('Team2_', 'Team1_'), ('team1_', 'team2_'), ('team2_', 'team1_'))
+
+
+def swap_permutation(columns):
+    """Index array that exchanges the teams: X[:, perm] is X with team1 and team2 swapped.
+
+    Team1_RoundScore/Team2_RoundScore and every team1_<agent>/team2_<agent>
+    pair trade places; every other column maps to itself.
+    """
+    columns = list(columns)
+    index = {name: i for i, name in enumerate(columns)}
+    perm = np.arange(len(columns), dtype=np.intp)
+    for i, name in enumerate(columns):
+        for prefix, other_prefix in SWAP_PREFIXES:
+            if name.startswith(prefix):
+                other = other_prefix + name[len(prefix):]
+                if other not in index:
+                    raise ValueError(f"Column '{name}' has no '{other}' column to swap with")
+                perm[i] = index[other]
+    return perm
+
+
+class FeatureEncoder:
+    """Encodes match states into model rows without going through pandas.
+
+    Produces the same values and column order as the UI's original
+    DataFrame-based format_input: agents and maps outside the vocabulary are
+    ignored, and expected columns that the vocabulary does not cover stay 0.
+    """
+
+    def __init__(self, all_agents, all_maps, expected_column_order, dtype=np.float32):
+        self.all_agents = list(all_agents)
+        self.all_maps = list(all_maps)
+        self.columns = list(expected_column_order)
+        self.n_features = len(self.columns)
+        self.dtype = dtype
+
+        # Name -> column index, resolved once
+        self.column_index = {name: idx for idx, name in enumerate(self.columns)}
+        self.round_col = self.column_index['RoundNumber']
+        self.team1_score_col = self.column_index['Team1_RoundScore']
+        self.team2_score_col = self.column_index['Team2_RoundScore']
+
+        self.agent_codes = {agent: code for code, agent in enumerate(self.all_agents)}
+        self.map_codes = {m: code for code, m in enumerate(self.all_maps)}
+
+        # Column for each agent/map code, -1 where the model has no such column
+        self.team1_cols = np.array([self.column_index.get(f'team1_{agent}', -1)
+                                    for agent in self.all_agents], dtype=np.intp)
+        self.team2_cols = np.array([self.column_index.get(f'team2_{agent}', -1)
+                                    for agent in self.all_agents], dtype=np.intp)
+        self.map_cols = np.array([self.column_index.get(f'Map_{m}', -1)
+                                  for m in self.all_maps], dtype=np.intp)
+
+        # Plain dicts for the single-row path, skipping columns the model lacks
+        self._team1_lookup = {agent: int(col) for agent, col in zip(self.all_agents, self.team1_cols) if col >= 0}
+        self._team2_lookup = {agent: int(col) for agent, col in zip(self.all_agents, self.team2_cols) if col >= 0}
+        self._map_lookup = {m: int(col) for m, col in zip(self.all_maps, self.map_cols) if col >= 0}
+
+        # Preallocated row reused by encode()
+        self._row = np.zeros((1, self.n_features), dtype=self.dtype)
+        self._swap_permutation = None
+
+    @property
+    def swap_permutation(self):
+        # Column order with the teams exchanged, for symmetric predictions
+        if self._swap_permutation is None:
+            self._swap_permutation = swap_permutation(self.columns)
+        return self._swap_permutation
+
+    @profiling.timed('encode')
+    def encode(self, team1_agents, team2_agents, map_name, round_number, team1_score, team2_score, out=None):
+        """Encode one state into a (1, n_features) row.
+
+        Without `out`, the encoder's own buffer is overwritten and returned, so
+        the result is only valid until the next call.
+        """
+        row = self._row if out is None else out
+        row.fill(0)
+        values = row[0]
+
+        values[self.round_col] = round_number
+        values[self.team1_score_col] = team1_score
+        values[self.team2_score_col] = team2_score
+
+        for agent in team1_agents:
+            col = self._team1_lookup.get(agent)
+            if col is not None:
+                values[col] = 1
+        for agent in team2_agents:
+            col = self._team2_lookup.get(agent)
+            if col is not None:
+                values[col] = 1
+
+        col = self._map_lookup.get(map_name)
+        if col is not None:
+            values[col] = 1
+        return row
+
+    def agent_code_matrix(self, teams, width=None):
+        """Convert an iterable of agent collections to an (n, width) code matrix padded with -1."""
+        teams = list(teams)
+        if width is None:
+            width = max((len(team) for team in teams), default=1)
+        codes = np.full((len(teams), width), -1, dtype=np.intp)
+        agent_codes = self.agent_codes
+        for i, team in enumerate(teams):
+            team_codes = [agent_codes[agent] for agent in team if agent in agent_codes]
+            codes[i, :len(team_codes)] = team_codes[:width]
+        return codes
+
+    def map_code_array(self, maps):
+        map_codes = self.map_codes
+        return np.fromiter((map_codes.get(m, -1) for m in maps), dtype=np.intp)
+
+    @profiling.timed('encode_batch')
+    def encode_codes(self, team1_codes, team2_codes, map_codes, round_numbers,
+                     team1_scores, team2_scores, out=None):
+        """Vectorized encoding from integer codes.
+
+        team1_codes/team2_codes are (n, k) agent code matrices and map_codes is a
+        length-n array; -1 marks an empty slot or an unknown name.
+        """
+        team1_codes = np.asarray(team1_codes, dtype=np.intp)
+        team2_codes = np.asarray(team2_codes, dtype=np.intp)
+        map_codes = np.asarray(map_codes, dtype=np.intp)
+        n = len(map_codes)
+
+        if out is None:
+            X = np.zeros((n, self.n_features), dtype=self.dtype)
+        else:
+            X = out[:n]
+            X.fill(0)
+
+        X[:, self.round_col] = round_numbers
+        X[:, self.team1_score_col] = team1_scores
+        X[:, self.team2_score_col] = team2_scores
+
+        # Scatter the one-hot blocks in one fancy-indexing assignment per block
+        for codes, lookup in ((team1_codes, self.team1_cols),
+                              (team2_codes, self.team2_cols),
+                              (map_codes[:, None], self.map_cols)):
+            cols = np.where(codes >= 0, lookup[codes], -1)
+            rows, slots = np.nonzero(cols >= 0)
+            X[rows, cols[rows, slots]] = 1
+        return X
+
+    def encode_many(self, states, out=None):
+        """Encode an iterable of
+        (team1_agents, team2_agents, map, round_number, team1_score, team2_score)
+        tuples into an (n, n_features) matrix.
+        """
+        states = list(states)
+        if not states:
+            return np.zeros((0, self.n_features), dtype=self.dtype)
+        team1, team2, maps, rounds, scores1, scores2 = zip(*states)
+        return self.encode_codes(self.agent_code_matrix(team1),
+                                 self.agent_code_matrix(team2),
+                                 self.map_code_array(maps),
+                                 np.asarray(rounds), np.asarray(scores1), np.asarray(scores2),
+                                 out=out)
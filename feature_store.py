@@ -0,0 +1,191 @@
+"""Incremental, on-disk cache of the round-level training matrix.
+
+Builds the same rows as the notebook's merged_rounds_df (before the random
+team swap): one row per parsed round, with the round number and scores, both
+teams' agent one-hot columns, the map dummies and Winner1. Each batch of
+games is written as a compact RoundMatrix .npz shard under a cache
+directory, with the GameIDs each shard covers recorded in manifest.json. Later runs only read, parse and encode
+games that are not in the cache yet.
+
+Usage:
+    python feature_store.py data/valorant.sqlite --cache data/feature_store
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from round_matrix import ROUND_COLUMNS, RoundMatrix, build_round_matrix
+from round_parser import parse_round_histories
+from team_pairing import pair_games
+
+MANIFEST = 'manifest.json'
+SHARD_FORMAT_VERSION = 2
+
+
+def feature_columns(agents, maps):
+    return (ROUND_COLUMNS
+            + [f'team1_{agent}' for agent in agents]
+            + [f'team2_{agent}' for agent in agents]
+            + [f'Map_{m}' for m in maps])
+
+
+def _read_for_games(conn, query, game_ids):
+    # Join against a temp table instead of an enormous IN (...) list
+    conn.execute("DROP TABLE IF EXISTS temp.batch_games")
+    conn.execute("CREATE TEMP TABLE batch_games (GameID TEXT PRIMARY KEY)")
+    conn.executemany("INSERT OR IGNORE INTO batch_games VALUES (?)", ((g,) for g in game_ids))
+    df = pd.read_sql_query(query, conn)
+    df['GameID'] = df['GameID'].astype(str)
+    return df
+
+
+def load_batch(conn, game_ids):
+    scoreboard = _read_for_games(
+        conn,
+        "SELECT GameID, TeamAbbreviation, Agent FROM Game_Scoreboard "
+        "WHERE CAST(GameID AS TEXT) IN (SELECT GameID FROM batch_games)",
+        game_ids)
+    games = _read_for_games(
+        conn,
+        "SELECT GameID, Map, Team1ID, Team2ID, Team1, Team2, Winner FROM Games "
+        "WHERE CAST(GameID AS TEXT) IN (SELECT GameID FROM batch_games)",
+        game_ids)
+    return scoreboard, games
+
+
+class FeatureStore:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, MANIFEST)
+        self.manifest = self._read_manifest()
+
+    def _read_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('version') != SHARD_FORMAT_VERSION:
+            raise ValueError(f"Feature store at '{self.cache_dir}' has format {manifest.get('version')}, "
+                             f"expected {SHARD_FORMAT_VERSION}; rebuild it with --rebuild")
+        return manifest
+
+    def _write_manifest(self):
+        # Rename into place so an interrupted run never leaves a torn manifest
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def columns(self):
+        return feature_columns(self.manifest['agents'], self.manifest['maps'])
+
+    def known_game_ids(self):
+        if self.manifest is None:
+            return set()
+        # Only cached games count: skipped ones may get their rounds or scoreboard later
+        return set(self.manifest['game_ids'])
+
+    def update(self, db_path, batch_size=20_000, workers=None, log=print):
+        """Add every game in db_path that isn't cached yet. Returns the number of new rounds."""
+        conn = sqlite3.connect(db_path)
+        try:
+            all_game_ids = [str(g) for (g,) in conn.execute("SELECT GameID FROM Games")]
+            if self.manifest is None:
+                # Vocabularies are fixed when the store is created, like the columns of the model
+                agents = sorted({a for (a,) in conn.execute("SELECT DISTINCT Agent FROM Game_Scoreboard")
+                                 if a})
+                maps = sorted({m for (m,) in conn.execute("SELECT DISTINCT Map FROM Games") if m})
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self.manifest = {'version': SHARD_FORMAT_VERSION, 'agents': agents, 'maps': maps,
+                                 'shards': [], 'game_ids': [], 'skipped_game_ids': []}
+
+            known = self.known_game_ids()
+            new_game_ids = list(dict.fromkeys(g for g in all_game_ids if g not in known))
+            retried = len(set(self.manifest['skipped_game_ids']).intersection(new_game_ids))
+            log(f"{len(known)} games cached, {len(new_game_ids)} to add "
+                f"({retried} of them skipped last time)")
+
+            added_rounds = 0
+            for start in range(0, len(new_game_ids), batch_size):
+                batch_ids = new_game_ids[start:start + batch_size]
+                added_rounds += self._add_batch(conn, db_path, batch_ids, workers, log)
+            return added_rounds
+        finally:
+            conn.close()
+
+    def _add_batch(self, conn, db_path, batch_ids, workers, log):
+        agents, maps = self.manifest['agents'], self.manifest['maps']
+        scoreboard, games = load_batch(conn, batch_ids)
+
+        unknown_agents = set(scoreboard['Agent'].dropna()) - set(agents) - {''}
+        unknown_maps = set(games['Map'].dropna()) - set(maps)
+        if unknown_agents or unknown_maps:
+            raise ValueError(f"New agents {sorted(unknown_agents)} or maps {sorted(unknown_maps)} are not in the "
+                             f"cached feature columns; rebuild the store with --rebuild")
+
+        paired = pair_games(scoreboard, games, agents=agents)
+        rounds_df = parse_round_histories(db_path, game_ids=paired.game_ids, workers=workers).to_frame()
+        matrix = build_round_matrix(paired, rounds_df, maps)
+
+        added_ids = sorted(matrix.game_ids.tolist())
+        if len(matrix):
+            shard_name = f"shard_{len(self.manifest['shards']):05d}.npz"
+            matrix.save(os.path.join(self.cache_dir, shard_name))
+            self.manifest['shards'].append({'file': shard_name, 'games': len(added_ids), 'rounds': len(matrix)})
+        self.manifest['game_ids'].extend(added_ids)
+        added = set(added_ids)
+        # Games still without usable data, retried on the next update
+        skipped = set(self.manifest['skipped_game_ids']) - added
+        skipped.update(g for g in batch_ids if g not in added)
+        self.manifest['skipped_game_ids'] = sorted(skipped)
+        self._write_manifest()
+
+        log(f"Cached {len(added_ids)} games / {len(matrix)} rounds "
+            f"({len(batch_ids) - len(added_ids)} games without usable data)")
+        return len(matrix)
+
+    def load_matrix(self):
+        """Return every cached round as one RoundMatrix."""
+        if self.manifest is None:
+            raise ValueError(f"No feature store at '{self.cache_dir}'; build it with feature_store.py first")
+        shards = [RoundMatrix.load(os.path.join(self.cache_dir, shard['file'])) for shard in self.manifest['shards']]
+        if not shards:
+            n_game_features = len(self.columns) - len(ROUND_COLUMNS)
+            return RoundMatrix(self.columns, [], np.zeros((0, n_game_features), dtype=np.uint8), [],
+                               np.zeros(0, dtype=np.int32), np.zeros((0, len(ROUND_COLUMNS)), dtype=np.uint8))
+        return RoundMatrix.concatenate(shards)
+
+    def load_frame(self):
+        """Return the cached rounds as a DataFrame shaped like merged_rounds_df."""
+        return self.load_matrix().to_frame()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or update the cached round-level training matrix.")
+    parser.add_argument('database', help="path to valorant.sqlite")
+    parser.add_argument('--cache', default=os.path.join('data', 'feature_store'), help="cache directory")
+    parser.add_argument('--batch-size', type=int, default=20_000, help="games processed per shard")
+    parser.add_argument('--workers', type=int, help="round-history parser processes (default: all cores)")
+    parser.add_argument('--rebuild', action='store_true', help="discard the cache and start over")
+    args = parser.parse_args(argv)
+
+    if args.rebuild and os.path.isdir(args.cache):
+        for name in os.listdir(args.cache):
+            if name == MANIFEST or (name.startswith('shard_') and name.endswith('.npz')):
+                os.remove(os.path.join(args.cache, name))
+
+    start = time.perf_counter()
+    store = FeatureStore(args.cache)
+    added = store.update(args.database, batch_size=args.batch_size, workers=args.workers)
+    print(f"Added {added} rounds in {time.perf_counter() - start:.2f}s; "
+          f"{len(store.manifest['game_ids'])} games cached in total")
+
+
+if __name__ == "__main__":
+    main()
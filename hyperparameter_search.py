@@ -0,0 +1,256 @@
+"""Parallel, resumable hyperparameter search over the cached round-level data.
+
+Folds are split by GameID, so every round of a game lands in the same fold,
+like the notebook's train_test_split on unique_game_ids. Candidates are
+pruned with successive halving: every candidate is scored on a small share
+of the training games, then only the best 1/factor move on to a share
+`factor` times larger, until the survivors train on all of it.
+
+The training data is written once as .npy files and memory-mapped by every
+worker, so it is never pickled per process. Each finished (candidate, rung,
+fold) trial is appended to trials.jsonl; running the same search again skips
+trials that are already recorded.
+
+Usage:
+    python feature_store.py data/valorant.sqlite
+    python hyperparameter_search.py --cache data/feature_store --out search --workers 8
+"""
+import argparse
+import json
+import math
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from round_matrix import RoundMatrix, swap_augment
+
+TRIALS = 'trials.jsonl'
+CONFIG = 'search.json'
+DATA_DIR = 'data'
+
+# The shipped model is a GradientBoostingClassifier; the random forest grid is the notebook's
+DEFAULT_GRIDS = {
+    'gb': {
+        'n_estimators': [100, 150, 300],
+        'learning_rate': [0.05, 0.1, 0.2],
+        'max_depth': [2, 3, 4],
+        'min_samples_leaf': [1, 20],
+    },
+    'rf': {
+        'n_estimators': [100, 200, 300],
+        'max_depth': [5, 10, 15],
+        'min_samples_split': [2, 5, 10],
+        'min_samples_leaf': [1, 2, 4],
+    },
+}
+
+
+def make_estimator(model, params, seed):
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+    if model == 'gb':
+        return GradientBoostingClassifier(random_state=seed, **params)
+    if model == 'rf':
+        return RandomForestClassifier(random_state=seed, n_jobs=1, **params)
+    raise ValueError(f"Unknown model '{model}', expected one of {sorted(DEFAULT_GRIDS)}")
+
+
+def halving_fractions(n_candidates, factor, min_fraction):
+    # Share of the training games used at each rung, ending at the full training set
+    n_rungs = 1 + min(math.ceil(math.log(max(n_candidates, 1), factor)),
+                      math.floor(math.log(1 / min_fraction, factor)))
+    return [factor ** (rung - n_rungs + 1) for rung in range(n_rungs)]
+
+
+def trial_key(params, fraction, fold):
+    return json.dumps({'params': params, 'fraction': round(fraction, 12), 'fold': fold}, sort_keys=True)
+
+
+# Per-process state, filled in by _init_worker
+_data = {}
+
+
+def _init_worker(data_dir):
+    matrix = RoundMatrix.open_arrays(os.path.join(data_dir, 'matrix'))
+    _data['matrix'] = matrix
+    _data['game_fold'] = np.load(os.path.join(data_dir, 'game_fold.npy'), mmap_mode='r')
+    _data['game_priority'] = np.load(os.path.join(data_dir, 'game_priority.npy'), mmap_mode='r')
+
+
+def run_trial(model, params, fraction, fold, scoring, augment, seed):
+    """Fit on `fraction` of the games outside `fold` and score on the games inside it."""
+    from sklearn.metrics import get_scorer
+
+    matrix = _data['matrix']
+    round_fold = _data['game_fold'][matrix.round_game]
+    round_priority = _data['game_priority'][matrix.round_game]
+    train_rows = np.flatnonzero((round_fold != fold) & (round_priority < fraction))
+    test_rows = np.flatnonzero(round_fold == fold)
+
+    train = swap_augment(matrix, augment, seed, rows=train_rows)
+    test = swap_augment(matrix, augment, seed, rows=test_rows)
+    start = time.perf_counter()
+    estimator = make_estimator(model, params, seed)
+    estimator.fit(train.to_dense(), train.y)
+    fit_seconds = time.perf_counter() - start
+    score = get_scorer(scoring)(estimator, test.to_dense(), test.y)
+    return {'params': params, 'fraction': fraction, 'fold': fold, 'score': float(score),
+            'train_rows': len(train), 'fit_seconds': fit_seconds}
+
+
+def prepare_data(matrix, out_dir, n_folds, seed):
+    """Write the shared memory-mappable arrays: the matrix, each game's fold and its sampling priority."""
+    data_dir = os.path.join(out_dir, DATA_DIR)
+    rng = np.random.default_rng(seed)
+    # Shuffle games, then deal them into folds round-robin
+    game_fold = np.empty(matrix.n_games, dtype=np.int8)
+    game_fold[rng.permutation(matrix.n_games)] = np.arange(matrix.n_games) % n_folds
+    # A game is in a rung's training share if its priority is below the rung's fraction
+    game_priority = rng.random(matrix.n_games)
+
+    matrix.save_arrays(os.path.join(data_dir, 'matrix'))
+    np.save(os.path.join(data_dir, 'game_fold.npy'), game_fold)
+    np.save(os.path.join(data_dir, 'game_priority.npy'), game_priority)
+    return data_dir
+
+
+class SearchCheckpoint:
+    def __init__(self, out_dir):
+        self.path = os.path.join(out_dir, TRIALS)
+        self.trials = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    # A line cut off by an interrupted write is simply redone
+                    try:
+                        trial = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.trials[trial_key(trial['params'], trial['fraction'], trial['fold'])] = trial
+
+    def get(self, params, fraction, fold):
+        return self.trials.get(trial_key(params, fraction, fold))
+
+    def add(self, trial):
+        self.trials[trial_key(trial['params'], trial['fraction'], trial['fold'])] = trial
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(trial) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def run_search(matrix, out_dir, model='gb', grid=None, n_folds=3, factor=3, min_fraction=0.05,
+               scoring='roc_auc', augment='both', workers=None, seed=42, log=print):
+    """Successive-halving search over `grid`; returns the surviving candidates' results, best first."""
+    from sklearn.model_selection import ParameterGrid
+
+    grid = DEFAULT_GRIDS[model] if grid is None else grid
+    candidates = list(ParameterGrid(grid))
+    fractions = halving_fractions(len(candidates), factor, min_fraction)
+    config = {'model': model, 'grid': grid, 'n_folds': n_folds, 'factor': factor, 'fractions': fractions,
+              'scoring': scoring, 'augment': augment, 'seed': seed,
+              'n_games': matrix.n_games, 'n_rounds': len(matrix)}
+
+    os.makedirs(out_dir, exist_ok=True)
+    config_path = os.path.join(out_dir, CONFIG)
+    if os.path.exists(config_path):
+        with open(config_path) as f:
+            previous = json.load(f)
+        if previous != json.loads(json.dumps(config)):
+            raise ValueError(f"'{out_dir}' holds a search with different settings; use a new --out directory")
+        data_dir = os.path.join(out_dir, DATA_DIR)
+    else:
+        data_dir = prepare_data(matrix, out_dir, n_folds, seed)
+        with open(config_path, 'w') as f:
+            json.dump(config, f, indent=1)
+
+    checkpoint = SearchCheckpoint(out_dir)
+    workers = os.cpu_count() if workers is None else workers
+    log(f"{len(candidates)} candidates, {n_folds} folds, rungs at {[round(f, 3) for f in fractions]} "
+        f"of the training games, {len(checkpoint.trials)} trials already done")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data_dir,)) as executor:
+        for rung, fraction in enumerate(fractions):
+            results = {}
+            pending = {}
+            for i, params in enumerate(candidates):
+                for fold in range(n_folds):
+                    trial = checkpoint.get(params, fraction, fold)
+                    if trial is not None:
+                        results.setdefault(i, []).append(trial)
+                    else:
+                        future = executor.submit(run_trial, model, params, fraction, fold, scoring, augment, seed)
+                        pending[future] = i
+            for future in as_completed(pending):
+                trial = future.result()
+                checkpoint.add(trial)
+                results.setdefault(pending[future], []).append(trial)
+
+            # Stable sort, so ties keep grid order whichever trials finished first
+            ranked = sorted(({'params': candidates[i],
+                              'score': float(np.mean([t['score'] for t in trials])),
+                              'score_std': float(np.std([t['score'] for t in trials])),
+                              'fraction': fraction}
+                             for i, trials in sorted(results.items())),
+                            key=lambda result: -result['score'])
+            log(f"Rung {rung}: {len(candidates)} candidates on {fraction:.3g} of the games, "
+                f"best {scoring} {ranked[0]['score']:.4f} with {ranked[0]['params']}")
+
+            if rung < len(fractions) - 1:
+                keep = max(1, math.ceil(len(candidates) / factor))
+                candidates = [result['params'] for result in ranked[:keep]]
+
+    with open(os.path.join(out_dir, 'results.json'), 'w') as f:
+        json.dump(ranked, f, indent=1)
+    return ranked
+
+
+def main(argv=None):
+    from feature_store import FeatureStore
+
+    parser = argparse.ArgumentParser(description="Tune the round-level model with parallel successive halving.")
+    parser.add_argument('--cache', default=os.path.join('data', 'feature_store'),
+                        help="feature store built by feature_store.py")
+    parser.add_argument('--out', default='search', help="directory for the shared data and the checkpoint")
+    parser.add_argument('--model', choices=sorted(DEFAULT_GRIDS), default='gb')
+    parser.add_argument('--grid', help="JSON file mapping parameter names to lists of values")
+    parser.add_argument('--folds', type=int, default=3, help="GameID folds")
+    parser.add_argument('--factor', type=int, default=3, help="halving factor")
+    parser.add_argument('--min-fraction', type=float, default=0.05,
+                        help="smallest share of the training games used by the first rung")
+    parser.add_argument('--scoring', default='roc_auc', help="sklearn scorer name")
+    parser.add_argument('--augment', choices=['both', 'random', 'none'], default='both',
+                        help="team-swap augmentation: both orientations, one random orientation per game, or none")
+    parser.add_argument('--workers', type=int, help="processes (default: all cores)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--refit', help="fit the best candidate on all rounds and pickle it here")
+    args = parser.parse_args(argv)
+
+    grid = None
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+
+    matrix = FeatureStore(args.cache).load_matrix()
+    start = time.perf_counter()
+    ranked = run_search(matrix, args.out, model=args.model, grid=grid, n_folds=args.folds, factor=args.factor,
+                        min_fraction=args.min_fraction, scoring=args.scoring, augment=args.augment,
+                        workers=args.workers, seed=args.seed)
+    print(f"Best {args.scoring} {ranked[0]['score']:.4f} ± {ranked[0]['score_std']:.4f} with "
+          f"{ranked[0]['params']} ({time.perf_counter() - start:.1f}s)")
+
+    if args.refit:
+        import pandas as pd
+        estimator = make_estimator(args.model, ranked[0]['params'], args.seed)
+        # Fit on a DataFrame so the pickle records its column order, like the notebook's model
+        rows = swap_augment(matrix, args.augment, args.seed)
+        estimator.fit(pd.DataFrame(rows.to_dense(), columns=matrix.columns), rows.y)
+        with open(args.refit, 'wb') as f:
+            pickle.dump(estimator, f)
+        print(f"Refit model saved to '{args.refit}'")
+
+
+if __name__ == "__main__":
+    main()
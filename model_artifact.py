@@ -0,0 +1,160 @@
+"""Versioned, memory-mappable model file.
+
+Layout:
+    8 bytes   magic b'VALMODEL'
+    4 bytes   format version (little-endian uint32)
+    4 bytes   header length (little-endian uint32)
+    header    UTF-8 JSON: feature column order, agent/map vocabularies, model
+              metadata, array descriptors and a SHA-256 of the payload
+    payload   the compiled model's arrays, each aligned to 64 bytes
+
+Arrays are opened with np.memmap, so loading copies nothing and every process
+on a host shares the same page-cached bytes.
+
+Usage:
+    python model_artifact.py gradient_boosting_model2.pkl gradient_boosting_model2.valmodel
+"""
+import argparse
+import hashlib
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+from compiled_model import ARRAY_FIELDS, CompiledGradientBoosting, compile_model, max_abs_difference
+
+MAGIC = b'VALMODEL'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+PREFIX = struct.Struct('<8sII')
+
+
+class ModelArtifact:
+    def __init__(self, model, columns, agents, maps, metadata, path=None):
+        self.model = model
+        self.columns = columns
+        self.agents = agents
+        self.maps = maps
+        self.metadata = metadata
+        self.path = path
+
+
+def _aligned(n):
+    return (n + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_artifact(path, compiled, columns, agents, maps, metadata=None):
+    if len(columns) != compiled.n_features_in_:
+        raise ValueError(f"Model expects {compiled.n_features_in_} features but {len(columns)} columns were given")
+
+    arrays = {name: np.ascontiguousarray(array) for name, array in compiled.arrays().items()}
+    descriptors = {}
+    offset = 0
+    for name, array in arrays.items():
+        descriptors[name] = {'dtype': array.dtype.str, 'shape': list(array.shape),
+                             'offset': offset, 'nbytes': array.nbytes}
+        offset = _aligned(offset + array.nbytes)
+
+    payload = bytearray(offset)
+    for name, array in arrays.items():
+        start = descriptors[name]['offset']
+        payload[start:start + array.nbytes] = array.tobytes()
+
+    model_metadata = compiled.metadata()
+    model_metadata.pop('feature_names')
+    header = {
+        'columns': list(columns),
+        'agents': list(agents),
+        'maps': list(maps),
+        'model': model_metadata,
+        'arrays': descriptors,
+        'payload_sha256': hashlib.sha256(payload).hexdigest(),
+        'metadata': metadata or {},
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    # Pad the header so the payload starts on an aligned offset
+    header_bytes += b' ' * (_aligned(PREFIX.size + len(header_bytes)) - PREFIX.size - len(header_bytes))
+
+    # Write beside the target and rename, so readers never see a half-written file
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        prefix = f.read(PREFIX.size)
+        if len(prefix) < PREFIX.size:
+            raise ValueError(f"'{path}' is too short to be a model artifact")
+        magic, version, header_length = PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"'{path}' is not a model artifact")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"'{path}' uses artifact format {version}, this code reads {FORMAT_VERSION}")
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    return header, PREFIX.size + header_length
+
+
+def load_artifact(path, verify=True):
+    header, payload_offset = read_header(path)
+
+    if verify:
+        payload = np.memmap(path, dtype=np.uint8, mode='r', offset=payload_offset)
+        if hashlib.sha256(payload).hexdigest() != header['payload_sha256']:
+            raise ValueError(f"'{path}' failed its checksum, the file is corrupt")
+        del payload
+
+    arrays = {}
+    for name in ARRAY_FIELDS:
+        descriptor = header['arrays'][name]
+        shape = tuple(descriptor['shape'])
+        if 0 in shape:
+            arrays[name] = np.zeros(shape, dtype=descriptor['dtype'])
+            continue
+        arrays[name] = np.memmap(path, dtype=np.dtype(descriptor['dtype']), mode='r',
+                                 offset=payload_offset + descriptor['offset'], shape=shape)
+
+    model_metadata = header['model']
+    model = CompiledGradientBoosting(**arrays,
+                                     init_raw=model_metadata['init_raw'],
+                                     classes=model_metadata['classes'],
+                                     n_features=model_metadata['n_features'],
+                                     feature_names=header['columns'])
+    return ModelArtifact(model, header['columns'], header['agents'], header['maps'],
+                         header.get('metadata', {}), path=path)
+
+
+def main(argv=None):
+    from valorant_model import load_model, schema_from_model
+
+    parser = argparse.ArgumentParser(description="Write a trained model as a memory-mappable artifact.")
+    parser.add_argument('model', help="pickled sklearn model")
+    parser.add_argument('output', help="where to write the artifact")
+    parser.add_argument('--tolerance', type=float, default=1e-9,
+                        help="maximum allowed probability difference from sklearn")
+    args = parser.parse_args(argv)
+
+    model = load_model(args.model)
+    compiled = compile_model(model)
+    difference = max_abs_difference(model, compiled)
+    if difference > args.tolerance:
+        raise SystemExit(f"Compiled model differs from sklearn by {difference:.3g}, not saving")
+
+    columns, agents, maps = schema_from_model(model)
+    save_artifact(args.output, compiled, columns, agents, maps,
+                  metadata={'source': os.path.basename(args.model)})
+
+    start = time.perf_counter()
+    load_artifact(args.output, verify=False)
+    elapsed = time.perf_counter() - start
+    print(f"Saved {args.output} ({os.path.getsize(args.output)} bytes, max difference {difference:.3g}, "
+          f"opens in {elapsed * 1000:.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
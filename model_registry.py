@@ -0,0 +1,331 @@
+"""Several models side by side, routed by map and patch era, with hot reload.
+
+Every model file in the registry directory (.valmodel artifact, compiled .npz
+or pickle) is one model, with its own feature schema and encoder, so models
+trained on different rosters or map pools can be served together. An
+optional JSON sidecar with the same name says which games a model serves;
+without one, it serves everything:
+
+    models/
+        default.valmodel
+        ascent_2023.valmodel
+        ascent_2023.json        {"maps": ["Ascent"], "eras": ["2023"], "priority": 0}
+
+A state goes to the most specific model that covers its map and era (both
+listed over one, over a catch-all), then the higher priority, then the
+lower name.
+
+refresh() rescans the directory and installs a new routing table in a
+single assignment, so a request that was already routed finishes on the
+model it got. A file that fails to load is reported and its previous
+version, if any, stays in service; replace model files by renaming a
+finished file into place. start_watching() refreshes on a background
+thread. Loaded models and encoders are kept in an LRU cache bounded by
+count and by file size, and are reloaded on demand after eviction. A model
+whose file has changed since it was loaded is never evicted or reloaded
+from the new file; it serves until refresh() installs or rejects the new one.
+
+Usage:
+    python model_registry.py models --map Ascent --era 2023
+"""
+import argparse
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from feature_encoder import FeatureEncoder
+from valorant_model import load_predictor, predict_win_proba
+
+DEFAULT_REGISTRY_DIR = 'models'
+MODEL_SUFFIXES = ('.valmodel', '.npz', '.pkl')
+# Map and era names come from requests, so only this many routes are memoized per table
+MAX_CACHED_ROUTES = 1024
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ModelSpec:
+    def __init__(self, name, path, maps=None, eras=None, priority=0, signature=None):
+        self.name = name
+        self.path = path
+        # None matches every map / era
+        self.maps = None if maps is None else frozenset(maps)
+        self.eras = None if eras is None else frozenset(str(era) for era in eras)
+        self.priority = priority
+        # (mtime, size) of the model file and its sidecar when this spec was read
+        self.signature = signature
+
+    def matches(self, map_name, era):
+        return ((self.maps is None or map_name in self.maps)
+                and (self.eras is None or (era is not None and str(era) in self.eras)))
+
+    @property
+    def sort_key(self):
+        specificity = (self.maps is not None) + (self.eras is not None)
+        return -specificity, -self.priority, self.name
+
+
+def read_spec(path):
+    """ModelSpec for a model file, with routing from its .json sidecar if there is one."""
+    name = os.path.splitext(os.path.basename(path))[0]
+    sidecar = os.path.splitext(path)[0] + '.json'
+    signature = _file_signature(path)
+    routing = {}
+    if os.path.exists(sidecar):
+        signature += _file_signature(sidecar)
+        with open(sidecar) as f:
+            routing = json.load(f)
+        if not isinstance(routing, dict):
+            raise ValueError(f"'{sidecar}' must hold an object with maps, eras and priority")
+        for key in ('maps', 'eras'):
+            if routing.get(key) is not None and not isinstance(routing[key], list):
+                raise ValueError(f"'{key}' in '{sidecar}' must be a list")
+        priority = routing.get('priority', 0)
+        if not isinstance(priority, int) or isinstance(priority, bool):
+            raise ValueError(f"'priority' in '{sidecar}' must be an integer")
+    return ModelSpec(name, path, routing.get('maps'), routing.get('eras'), routing.get('priority', 0), signature)
+
+
+class LoadedModel:
+    def __init__(self, spec, model, encoder, nbytes):
+        self.spec = spec
+        self.name = spec.name
+        self.model = model
+        self.encoder = encoder
+        self.nbytes = nbytes
+
+
+class RoutingTable:
+    # Immutable once built; the registry swaps in a whole new table on refresh
+
+    def __init__(self, specs):
+        self.specs = tuple(sorted(specs, key=lambda spec: spec.sort_key))
+        self.by_path = {spec.path: spec for spec in self.specs}
+        self._routes = {}
+
+    def route(self, map_name, era=None):
+        key = (map_name, era)
+        spec = self._routes.get(key)
+        if spec is None:
+            # specs are sorted best first, so the first match wins
+            spec = next((spec for spec in self.specs if spec.matches(map_name, era)), None)
+            if spec is None:
+                raise ValueError(f"No model serves map '{map_name}'" + (f" in era '{era}'" if era else ""))
+            if len(self._routes) < MAX_CACHED_ROUTES:
+                self._routes[key] = spec
+        return spec
+
+
+class ModelRegistry:
+    def __init__(self, directory=DEFAULT_REGISTRY_DIR, max_models=8, max_bytes=None, log=print):
+        self.directory = directory
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.log = log
+        self._table = RoutingTable([])
+        # (path, signature) -> LoadedModel, least recently used first
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # (path, signature) -> (agents, maps) of every installed model, kept across evictions
+        self._vocabularies = {}
+        self._refresh_lock = threading.Lock()
+        # path -> signature of files that failed to load, retried once they change
+        self._failed = {}
+        self._stop = None
+        self._watcher = None
+
+    @property
+    def specs(self):
+        # Routing order, best match first
+        return self._table.specs
+
+    @property
+    def models(self):
+        return [spec.name for spec in self.specs]
+
+    def vocabulary(self):
+        """Every agent and map that at least one model has columns for."""
+        agents, maps = set(), {}
+        for spec in self.specs:
+            vocabulary = self._vocabularies.get((spec.path, spec.signature))
+            if vocabulary is None:
+                encoder = self._get(spec).encoder
+                vocabulary = encoder.all_agents, encoder.all_maps
+            agents.update(vocabulary[0])
+            maps.update(dict.fromkeys(vocabulary[1]))
+        return sorted(agents), list(maps)
+
+    def refresh(self):
+        """Rescan the directory and install the new routing table. Returns True if it changed."""
+        with self._refresh_lock:
+            current = self._table
+            specs = []
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith(MODEL_SUFFIXES))
+            for name in names:
+                path = os.path.join(self.directory, name)
+                previous = current.by_path.get(path)
+                if previous is not None:
+                    specs.append(previous)
+                try:
+                    spec = read_spec(path)
+                except (OSError, ValueError) as e:
+                    self.log(f"Could not read model '{path}': {e}")
+                    continue
+                if spec.signature in (getattr(previous, 'signature', None), self._failed.get(path)):
+                    continue
+                try:
+                    # Load before installing, so a broken file never takes traffic
+                    self._get(spec)
+                except Exception as e:
+                    self._failed[path] = spec.signature
+                    self.log(f"Could not load model '{path}', "
+                             f"{'keeping the previous version' if previous else 'skipping it'}: {e}")
+                    continue
+                self._failed.pop(path, None)
+                if previous is not None:
+                    specs.remove(previous)
+                self.log(f"{'Reloaded' if previous is not None else 'Loaded'} model '{spec.name}'")
+                specs.append(spec)
+
+            removed = set(current.by_path) - {spec.path for spec in specs}
+            for path in sorted(removed):
+                self.log(f"Removed model '{current.by_path[path].name}'")
+            # Specs compare by identity: unchanged files keep their old spec object
+            if {spec.path: spec for spec in specs} == current.by_path:
+                return False
+            self._table = RoutingTable(specs)
+            with self._cache_lock:
+                current_keys = {(spec.path, spec.signature) for spec in specs}
+                self._vocabularies = {key: vocabulary for key, vocabulary in self._vocabularies.items()
+                                      if key in current_keys}
+            return True
+
+    def spec_for(self, map_name, era=None):
+        """The ModelSpec serving (map_name, era), without loading the model."""
+        return self._table.route(map_name, era)
+
+    def route(self, map_name, era=None):
+        """The LoadedModel serving (map_name, era)."""
+        return self._get(self._table.route(map_name, era))
+
+    def _get(self, spec):
+        key = (spec.path, spec.signature)
+        with self._cache_lock:
+            loaded = self._cache.get(key)
+            if loaded is not None:
+                self._cache.move_to_end(key)
+                return loaded
+
+        # Load outside the lock so other models stay available meanwhile
+        model, columns, agents, maps = load_predictor(spec.path)
+        if not self._unchanged(spec):
+            # The file was replaced since the spec was read; never cache new weights under an old spec
+            raise ValueError(f"Model file '{spec.path}' changed on disk, waiting for the next refresh")
+        loaded = LoadedModel(spec, model, FeatureEncoder(agents, maps, columns), spec.signature[1])
+
+        with self._cache_lock:
+            self._vocabularies[key] = (loaded.encoder.all_agents, loaded.encoder.all_maps)
+            loaded = self._cache.setdefault(key, loaded)
+            self._cache.move_to_end(key)
+            self._evict(keep=key)
+        return loaded
+
+    def _unchanged(self, spec):
+        try:
+            return _file_signature(spec.path) == spec.signature[:2]
+        except OSError:
+            return False
+
+    def _evict(self, keep):
+        # Least recently used first, never the model just requested. A routed
+        # model whose file has changed since it was loaded couldn't be loaded
+        # again, so it stays until a refresh replaces or removes it
+        total = sum(entry.nbytes for entry in self._cache.values())
+        for key in list(self._cache):
+            if len(self._cache) <= self.max_models and (self.max_bytes is None or total <= self.max_bytes):
+                break
+            entry = self._cache[key]
+            if key == keep or (self._table.by_path.get(entry.spec.path) is entry.spec
+                               and not self._unchanged(entry.spec)):
+                continue
+            del self._cache[key]
+            total -= entry.nbytes
+
+    def predict(self, states, eras=None, symmetric=False, errors=None):
+        """Team 1 win probability for each (team1_agents, team2_agents, map, round, score1, score2) state.
+
+        eras, if given, holds one era per state. States are grouped by the
+        model that serves them and each group is scored in one batch. A state
+        that can't be routed raises ValueError, unless errors is a dict: then
+        the error is stored under the state's index, its probability is NaN
+        and the other states are still scored.
+        """
+        states = list(states)
+        eras = [None] * len(states) if eras is None else list(eras)
+        groups = {}
+        for i, (state, era) in enumerate(zip(states, eras)):
+            try:
+                loaded = self.route(state[2], era)
+            except ValueError as e:
+                if errors is None:
+                    raise
+                errors[i] = e
+                continue
+            groups.setdefault(id(loaded), (loaded, []))[1].append(i)
+
+        win_proba = np.full(len(states), np.nan)
+        for loaded, rows in groups.values():
+            X = loaded.encoder.encode_many([states[i] for i in rows])
+            swap = loaded.encoder.swap_permutation if symmetric else None
+            win_proba[rows] = predict_win_proba(loaded.model, X, swap=swap)
+        return win_proba
+
+    def start_watching(self, interval=2.0):
+        """Refresh every `interval` seconds on a daemon thread until stop_watching()."""
+        if self._watcher is not None:
+            return
+        self._stop = threading.Event()
+
+        def watch(stop):
+            while not stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    self.log(f"Model registry refresh failed: {e}")
+
+        self._watcher = threading.Thread(target=watch, args=(self._stop,), name='model-registry', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List a model registry and show which model serves a game.")
+    parser.add_argument('directory', nargs='?', default=DEFAULT_REGISTRY_DIR, help="model directory")
+    parser.add_argument('--map', help="show the model routed to this map")
+    parser.add_argument('--era', help="patch era to route with --map")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.directory)
+    registry.refresh()
+    for spec in registry.specs:
+        encoder = registry._get(spec).encoder
+        print(f"{spec.name}: maps {sorted(spec.maps) if spec.maps else 'all'}, "
+              f"eras {sorted(spec.eras) if spec.eras else 'all'}, priority {spec.priority}, "
+              f"{len(encoder.all_agents)} agents / {len(encoder.all_maps)} maps in its schema")
+    if args.map:
+        print(f"{args.map}" + (f" ({args.era})" if args.era else "") + f" -> {registry.route(args.map, args.era).name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""Local HTTP prediction service.
+
+Keeps one model and encoder in memory, or a model registry that routes each
+state by map and patch era, and coalesces concurrent single-state requests
+into batched predict_proba calls. Only the standard library is used
+for the server, so it runs anywhere the UI does.
+
+Endpoints:
+    POST /predict        one state, e.g.
+                         {"team1_agents": ["jett", ...], "team2_agents": [...],
+                          "map": "Ascent", "round_number": 5,
+                          "team1_score": 3, "team2_score": 1}
+                         plus an optional "era" when serving a registry
+    POST /predict/batch  {"states": [state, ...]}
+    GET  /health         includes the registry's models, in routing order
+    GET  /metrics        per-stage latency histograms, when profiling is on
+                         (VALORANT_PROFILE=1 or --profile)
+
+Usage:
+    python prediction_server.py serve --port 8000 --batch-window-ms 2
+    python prediction_server.py serve --registry models
+    python prediction_server.py benchmark --clients 64 --requests 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import profiling
+from feature_encoder import ALL_AGENTS, ALL_MAPS, FeatureEncoder
+from model_registry import ModelRegistry
+from valorant_model import load_predictor, predict_win_proba
+
+STATE_FIELDS = ('team1_agents', 'team2_agents', 'map', 'round_number', 'team1_score', 'team2_score')
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+def parse_state(payload):
+    # Validate here so one bad request can't fail the whole batch it lands in
+    try:
+        team1_agents, team2_agents, map_name, round_number, team1_score, team2_score = (
+            payload[field] for field in STATE_FIELDS)
+    except (KeyError, TypeError):
+        raise ValueError(f"State must be an object with fields {', '.join(STATE_FIELDS)}")
+    for agents in (team1_agents, team2_agents):
+        if not isinstance(agents, list) or not all(isinstance(agent, str) for agent in agents):
+            raise ValueError("team1_agents and team2_agents must be lists of agent names")
+    try:
+        return (team1_agents, team2_agents, str(map_name),
+                int(round_number), int(team1_score), int(team2_score))
+    except (TypeError, ValueError):
+        raise ValueError("round_number, team1_score and team2_score must be integers")
+
+
+def parse_era(payload):
+    era = payload.get('era')
+    return None if era is None else str(era)
+
+
+class MicroBatcher:
+    # Collects single-state requests for up to `window` seconds (or until
+    # `max_batch_size` are waiting) and scores them in one model call. With a
+    # registry, model and encoder are unused and each batch is split by the
+    # model that serves each state
+
+    def __init__(self, model, encoder, window=0.002, max_batch_size=256, executor=None, symmetric=False,
+                 registry=None):
+        self.model = model
+        self.encoder = encoder
+        self.registry = registry
+        # Average each state with its team-swapped mirror
+        self.symmetric = symmetric
+        self.swap = encoder.swap_permutation if symmetric and registry is None else None
+        self.window = window
+        self.max_batch_size = max_batch_size
+        # A single worker keeps model calls serialized off the event loop
+        self.executor = executor or ThreadPoolExecutor(max_workers=1)
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.states_scored = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, state, era=None):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((state, era, future))
+        return await future
+
+    async def score_many(self, states, eras=None):
+        # Bulk requests are already batched, so they skip the coalescing window
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._score, states, eras)
+
+    @profiling.timed('server_batch')
+    def _score(self, states, eras=None, errors=None):
+        # With errors (a dict), states the registry can't route fail alone instead of the whole batch
+        profiling.count('server_batches')
+        if self.registry is not None:
+            return self.registry.predict(states, eras, symmetric=self.symmetric, errors=errors)
+        X = self.encoder.encode_many(states)
+        return predict_win_proba(self.model, X, swap=self.swap)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(pending) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    pending.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            states = [state for state, _, _ in pending]
+            eras = [era for _, era, _ in pending]
+            errors = {}
+            try:
+                win_proba = await loop.run_in_executor(self.executor, self._score, states, eras, errors)
+            except Exception as e:
+                for _, _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.states_scored += len(states) - len(errors)
+            for i, ((_, _, future), p) in enumerate(zip(pending, win_proba)):
+                if future.done():
+                    continue
+                if i in errors:
+                    future.set_exception(errors[i])
+                else:
+                    future.set_result(float(p))
+
+
+class PredictionServer:
+    max_body_size = 64 * 1024 * 1024
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def handle_connection(self, reader, writer):
+        # HTTP/1.1 with keep-alive, which is all the overlay clients need
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'malformed request line'}, keep_alive=False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    await self._respond(writer, 400, {'error': 'invalid Content-Length'}, keep_alive=False)
+                    break
+                if length > self.max_body_size:
+                    await self._respond(writer, 413, {'error': 'request body too large'}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                keep_alive = headers.get('connection', '').lower() != 'close'
+
+                status, response = await self.dispatch(method, path, body)
+                await self._respond(writer, status, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body):
+        path = path.split('?', 1)[0]
+        try:
+            if path == '/health':
+                health = {'status': 'ok', 'batches': self.batcher.batches,
+                          'states_scored': self.batcher.states_scored}
+                if self.batcher.registry is not None:
+                    health['models'] = self.batcher.registry.models
+                return 200, health
+            if path == '/metrics':
+                return 200, {'profiling': profiling.is_enabled(), **profiling.snapshot()}
+            if path not in ('/predict', '/predict/batch'):
+                return 404, {'error': f'unknown path {path}'}
+            if method != 'POST':
+                return 405, {'error': 'use POST'}
+
+            payload = json.loads(body or b'null')
+            if path == '/predict':
+                p = await self.batcher.submit(parse_state(payload), parse_era(payload))
+                return 200, {'team1_win_probability': p, 'team2_win_probability': 1 - p}
+
+            states = payload.get('states') if isinstance(payload, dict) else payload
+            if not isinstance(states, list):
+                return 400, {'error': 'expected {"states": [...]}'}
+            if not states:
+                return 200, {'team1_win_probability': [], 'team2_win_probability': []}
+            win_proba = await self.batcher.score_many([parse_state(s) for s in states],
+                                                      [parse_era(s) for s in states])
+            return 200, {'team1_win_probability': win_proba.tolist(),
+                         'team2_win_probability': (1 - win_proba).tolist()}
+        except ValueError as e:
+            # json.JSONDecodeError is a ValueError too
+            return 400, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': str(e)}
+
+    async def _respond(self, writer, status, payload, keep_alive=True):
+        body = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+async def start_server(model, encoder, host='127.0.0.1', port=8000, window=0.002, max_batch_size=256,
+                       symmetric=False, registry=None):
+    batcher = MicroBatcher(model, encoder, window=window, max_batch_size=max_batch_size, symmetric=symmetric,
+                           registry=registry)
+    batcher.start()
+    server = PredictionServer(batcher)
+    tcp_server = await asyncio.start_server(server.handle_connection, host, port)
+    return tcp_server, batcher
+
+
+def random_state(rng):
+    return {
+        'team1_agents': rng.sample(ALL_AGENTS, 5),
+        'team2_agents': rng.sample(ALL_AGENTS, 5),
+        'map': rng.choice(ALL_MAPS),
+        'round_number': rng.randint(1, 24),
+        'team1_score': rng.randint(0, 12),
+        'team2_score': rng.randint(0, 12),
+    }
+
+
+async def _client(host, port, n_requests, rng, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(n_requests):
+            body = json.dumps(random_state(rng)).encode()
+            request = (f"POST /predict HTTP/1.1\r\nHost: {host}\r\n"
+                       f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+            start = time.perf_counter()
+            writer.write(request.encode('latin-1') + body)
+            await writer.drain()
+
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.strip().lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if b' 200 ' not in status_line:
+                raise RuntimeError(f"Server returned {status_line!r}")
+    finally:
+        writer.close()
+
+
+async def run_benchmark(host, port, clients=32, requests_per_client=100, seed=0):
+    # Closed-loop load: each client sends its next request as soon as the previous one returns
+    rng = random.Random(seed)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, requests_per_client, random.Random(rng.random()), latencies)
+                           for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'requests': len(latencies),
+        'clients': clients,
+        'seconds': elapsed,
+        'throughput_rps': len(latencies) / elapsed,
+        'latency_ms': {f'p{q}': float(np.percentile(latencies_ms, q)) for q in (50, 90, 95, 99)},
+        'latency_ms_max': float(latencies_ms.max()),
+    }
+
+
+async def _serve(args):
+    model = encoder = registry = None
+    if args.registry:
+        registry = ModelRegistry(args.registry)
+        registry.refresh()
+        if not registry.models:
+            raise SystemExit(f"No loadable models in '{args.registry}'")
+        # New and replaced model files are picked up while serving
+        registry.start_watching()
+    else:
+        model, columns, agents, maps = load_predictor(args.model)
+        encoder = FeatureEncoder(agents, maps, columns)
+    tcp_server, _ = await start_server(model, encoder, args.host, args.port,
+                                       window=args.batch_window_ms / 1000,
+                                       max_batch_size=args.max_batch_size,
+                                       symmetric=args.symmetric,
+                                       registry=registry)
+    print(f"Serving predictions on http://{args.host}:{args.port}")
+    try:
+        async with tcp_server:
+            await tcp_server.serve_forever()
+    finally:
+        if registry is not None:
+            registry.stop_watching()
+
+
+async def _benchmark(args):
+    tcp_server = batcher = None
+    if args.url is None:
+        # Spin up an in-process server so the benchmark is self-contained
+        model, columns, agents, maps = load_predictor(args.model)
+        encoder = FeatureEncoder(agents, maps, columns)
+        tcp_server, batcher = await start_server(model, encoder, args.host, 0,
+                                                 window=args.batch_window_ms / 1000,
+                                                 max_batch_size=args.max_batch_size,
+                                                 symmetric=args.symmetric)
+        host, port = tcp_server.sockets[0].getsockname()[:2]
+    else:
+        host, _, port = args.url.rpartition(':')
+        port = int(port)
+
+    try:
+        report = await run_benchmark(host, port, args.clients, args.requests)
+    finally:
+        if tcp_server is not None:
+            tcp_server.close()
+            await tcp_server.wait_closed()
+            await batcher.stop()
+
+    if batcher is not None:
+        report['mean_batch_size'] = batcher.states_scored / max(batcher.batches, 1)
+    if profiling.is_enabled():
+        report['profile'] = profiling.snapshot()
+    print(json.dumps(report, indent=2))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Valorant win-probability service.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    for name in ('serve', 'benchmark'):
+        sub = subparsers.add_parser(name)
+        sub.add_argument('--model', help="model artifact, compiled .npz or pickle "
+                                         "(default: the .valmodel artifact if present, else the pickle)")
+        sub.add_argument('--host', default='127.0.0.1')
+        sub.add_argument('--batch-window-ms', type=float, default=2.0,
+                         help="how long to wait for more requests before scoring a batch")
+        sub.add_argument('--max-batch-size', type=int, default=256)
+        sub.add_argument('--symmetric', action='store_true',
+                         help="average each state with its team-swapped mirror")
+        sub.add_argument('--profile', action='store_true',
+                         help="record per-stage latency histograms, served on GET /metrics")
+        if name == 'serve':
+            sub.add_argument('--port', type=int, default=8000)
+            sub.add_argument('--registry', metavar='DIR',
+                             help="serve every model in DIR, routed by map and era, instead of --model")
+        else:
+            sub.add_argument('--url', help="host:port of a running server; starts one in-process if omitted")
+            sub.add_argument('--clients', type=int, default=32)
+            sub.add_argument('--requests', type=int, default=100, help="requests per client")
+
+    args = parser.parse_args(argv)
+    if args.profile:
+        profiling.enable()
+    try:
+        asyncio.run(_serve(args) if args.command == 'serve' else _benchmark(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
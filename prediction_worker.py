@@ -0,0 +1,77 @@
+"""Background worker that only runs the newest request.
+
+The UI submits zero-argument jobs under a key ('table', 'state', ...). Only
+the latest job per key waits to run: submitting again replaces a job that
+hasn't started, and a result that finishes after a newer submit (or a
+cancel) is dropped when the UI collects results. Jobs run one at a time on a
+single daemon thread, so they may share the encoder's buffers.
+"""
+import queue
+import threading
+
+
+class LatestRequestWorker:
+    def __init__(self, notify=None):
+        # Called from the worker thread after each result, e.g. to wake up the UI thread
+        self.notify = notify
+        self._condition = threading.Condition()
+        # key -> (generation, job) waiting to run, and the newest generation per key
+        self._pending = {}
+        self._generations = {}
+        self._results = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='prediction-worker', daemon=True)
+        self._thread.start()
+
+    def submit(self, key, job):
+        """Queue job under key, replacing the key's previous job if it hasn't started."""
+        with self._condition:
+            generation = self._generations.get(key, 0) + 1
+            self._generations[key] = generation
+            self._pending[key] = (generation, job)
+            self._condition.notify()
+        return generation
+
+    def cancel(self, key):
+        # Drop the waiting job and make any running one's result stale
+        with self._condition:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._pending.pop(key, None)
+
+    def results(self):
+        """Return the (key, result, error) tuples that are still current. Call from the UI thread."""
+        current = []
+        while True:
+            try:
+                key, generation, result, error = self._results.get_nowait()
+            except queue.Empty:
+                return current
+            with self._condition:
+                if generation == self._generations.get(key):
+                    current.append((key, result, error))
+
+    def close(self, timeout=1.0):
+        with self._condition:
+            self._closed = True
+            self._pending.clear()
+            self._condition.notify()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                key = next(iter(self._pending))
+                generation, job = self._pending.pop(key)
+
+            result, error = None, None
+            try:
+                result = job()
+            except Exception as e:
+                error = e
+            self._results.put((key, generation, result, error))
+            if self.notify is not None:
+                self.notify()
@@ -0,0 +1,142 @@
+"""Optional per-stage latency histograms and counters for the prediction path.
+
+Off by default: every hook first checks one module global and returns. Turn
+it on with enable() or by setting VALORANT_PROFILE=1 before the process
+starts; snapshot() then reports count, mean, min, max and approximate
+percentiles per stage. The prediction server serves the snapshot on
+GET /metrics.
+
+Usage:
+    import profiling
+    profiling.enable()
+    ...
+    print(profiling.snapshot())
+"""
+import functools
+import math
+import os
+import threading
+import time
+
+# Histogram buckets are spaced 1/8 of a decade apart from 100 ns up to 100 s
+BUCKETS_PER_DECADE = 8
+MIN_SECONDS = 1e-7
+N_BUCKETS = 9 * BUCKETS_PER_DECADE + 2
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = 0.0
+
+    def add(self, seconds):
+        if seconds <= MIN_SECONDS:
+            bucket = 0
+        else:
+            bucket = min(int(math.log10(seconds / MIN_SECONDS) * BUCKETS_PER_DECADE) + 1, N_BUCKETS - 1)
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.min = min(self.min, seconds)
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q):
+        # Upper edge of the bucket holding the q-th percentile, clamped to the observed range
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                upper = MIN_SECONDS * 10 ** (bucket / BUCKETS_PER_DECADE)
+                return min(max(upper, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000 if self.count else 0.0,
+            'min_ms': self.min * 1000 if self.count else 0.0,
+            'max_ms': self.max * 1000,
+            **{f'p{q}_ms': self.percentile(q) * 1000 for q in (50, 90, 99)},
+        }
+
+
+class Profiler:
+    def __init__(self):
+        self.stages = {}
+        self.counters = {}
+        # Server threads and the UI worker record concurrently
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            histogram = self.stages.get(stage)
+            if histogram is None:
+                histogram = self.stages[stage] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def count(self, counter, n=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            return {'stages': {name: h.to_dict() for name, h in sorted(self.stages.items())},
+                    'counters': dict(sorted(self.counters.items()))}
+
+
+# The active profiler, or None when profiling is off
+_active = None
+
+
+def enable():
+    """Start recording (keeping anything already recorded) and return the profiler."""
+    global _active
+    if _active is None:
+        _active = Profiler()
+    return _active
+
+
+def disable():
+    global _active
+    _active = None
+
+
+def is_enabled():
+    return _active is not None
+
+
+def snapshot():
+    return _active.snapshot() if _active is not None else {'stages': {}, 'counters': {}}
+
+
+def count(counter, n=1):
+    profiler = _active
+    if profiler is not None:
+        profiler.count(counter, n)
+
+
+def timed(stage):
+    """Decorator recording each call's wall time under `stage` while profiling is on."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profiler = _active
+            if profiler is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profiler.record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+if os.environ.get('VALORANT_PROFILE', '') not in ('', '0'):
+    enable()
@@ -0,0 +1,230 @@
+"""Replay historical games from valorant.sqlite as a live stream of predictions.
+
+Games are read in match date order (GameID order if the database has no
+Matches.Date) through a cursor, chunk by chunk, so the tables are never
+loaded whole. Up to `concurrent_games` games are live at once; every tick
+advances each live game by one round and scores all of them in one batched
+predict_proba call, emitting one event per round. When a game ends the next
+one from the stream takes its place.
+
+By default ticks run as fast as the model allows. With a speed multiplier,
+a tick is paced to `round_seconds / speed` of wall time, e.g. speed=1 plays
+rounds in roughly real time and speed=100 a hundred times faster, which is
+useful for load-testing consumers of the stream.
+
+Usage:
+    python replay.py data/valorant.sqlite --concurrent 48
+    python replay.py data/valorant.sqlite --speed 200 --out events.jsonl
+"""
+import argparse
+import json
+import sqlite3
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from feature_store import load_batch
+from round_parser import parse_history
+from team_pairing import pair_games
+from valorant_model import predict_win_proba
+
+TEAM_SIZE = 5
+
+ReplayEvent = namedtuple('ReplayEvent', ['game_id', 'map', 'round_number', 'team1_score', 'team2_score',
+                                         'team1_win_probability'])
+
+
+class ReplayGame:
+    def __init__(self, game_id, map_name, map_code, team1_codes, team2_codes, rounds):
+        self.game_id = game_id
+        self.map = map_name
+        self.map_code = map_code
+        # Agent codes padded with -1 to TEAM_SIZE, as FeatureEncoder.encode_codes takes them
+        self.team1_codes = team1_codes
+        self.team2_codes = team2_codes
+        # (round, team1 score, team2 score) after each round, in round order
+        self.rounds = rounds
+        self.next_round = 0
+
+
+def _padded_codes(multi_hot_row):
+    codes = np.full(TEAM_SIZE, -1, dtype=np.intp)
+    present = np.flatnonzero(multi_hot_row)[:TEAM_SIZE]
+    codes[:len(present)] = present
+    return codes
+
+
+class ReplayEngine:
+    def __init__(self, db_path, model, encoder, concurrent_games=32, speed=None, round_seconds=100.0,
+                 chunk_size=500, symmetric=False, max_games=None):
+        self.db_path = db_path
+        self.model = model
+        self.encoder = encoder
+        self.concurrent_games = concurrent_games
+        # None or 0 replays as fast as possible
+        self.speed = speed or None
+        self.round_seconds = round_seconds
+        self.chunk_size = chunk_size
+        self.swap = encoder.swap_permutation if symmetric else None
+        self.max_games = max_games
+        self.stats = {'events': 0, 'batches': 0, 'games_started': 0, 'games_finished': 0,
+                      'games_skipped': 0, 'seconds': 0.0}
+
+    @property
+    def events_per_second(self):
+        return self.stats['events'] / self.stats['seconds'] if self.stats['seconds'] else 0.0
+
+    def _game_query(self, conn):
+        # Plain column equality in the joins lets SQLite build automatic indexes for them.
+        # Duplicate Game_Rounds rows come out adjacent, in rowid order, so the last one can win
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(Matches)")}
+        if {'MatchID', 'Date'} <= columns:
+            # One date per match, so a repeated MatchID can't duplicate its games
+            return ("SELECT CAST(g.GameID AS TEXT), r.RoundHistory FROM Games g "
+                    "JOIN Game_Rounds r ON r.GameID = g.GameID "
+                    "LEFT JOIN (SELECT MatchID, MIN(Date) AS Date FROM Matches GROUP BY MatchID) m "
+                    "ON m.MatchID = g.MatchID "
+                    "ORDER BY m.Date, g.GameID, r.rowid")
+        return ("SELECT CAST(g.GameID AS TEXT), r.RoundHistory FROM Games g "
+                "JOIN Game_Rounds r ON r.GameID = g.GameID "
+                "ORDER BY g.GameID, r.rowid")
+
+    def _chunk_games(self, lookup_conn, rows):
+        # Last RoundHistory per game, keeping stream order
+        histories = {}
+        for game_id, text in rows:
+            histories.pop(game_id, None)
+            histories[game_id] = text
+
+        scoreboard, games = load_batch(lookup_conn, list(histories))
+        paired = pair_games(scoreboard, games, agents=self.encoder.all_agents)
+        position = {game_id: i for i, game_id in enumerate(paired.game_ids)}
+        maps = paired.info['Map'].tolist()
+
+        for game_id, text in histories.items():
+            i = position.get(game_id)
+            rounds, _ = parse_history(text)
+            if i is None or not rounds:
+                self.stats['games_skipped'] += 1
+                continue
+            yield ReplayGame(game_id, maps[i], self.encoder.map_codes.get(maps[i], -1),
+                             _padded_codes(paired.team1_agents[i]), _padded_codes(paired.team2_agents[i]),
+                             sorted(rounds))
+
+    def iter_games(self):
+        """Replayable games in stream order, read chunk by chunk."""
+        conn = sqlite3.connect(self.db_path)
+        # Scoreboard lookups need their own connection while the cursor is open
+        lookup_conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.execute(self._game_query(conn))
+            carry = []
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                rows = carry + rows
+                # Hold back the last game, its duplicate rows may continue in the next chunk
+                last_game = rows[-1][0]
+                carry = [row for row in rows if row[0] == last_game]
+                yield from self._chunk_games(lookup_conn, [row for row in rows if row[0] != last_game])
+            if carry:
+                yield from self._chunk_games(lookup_conn, carry)
+        finally:
+            conn.close()
+            lookup_conn.close()
+
+    def events(self):
+        """Generate ReplayEvents, one per round, interleaving the live games tick by tick."""
+        games = self.iter_games()
+        live = []
+        start = time.perf_counter()
+        tick = 0
+        try:
+            while True:
+                while len(live) < self.concurrent_games and (
+                        self.max_games is None or self.stats['games_started'] < self.max_games):
+                    game = next(games, None)
+                    if game is None:
+                        break
+                    live.append(game)
+                    self.stats['games_started'] += 1
+                if not live:
+                    break
+
+                if self.speed is not None:
+                    # Pace against the schedule, so slow ticks don't add up to drift
+                    delay = start + tick * self.round_seconds / self.speed - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+
+                states = np.array([game.rounds[game.next_round] for game in live], dtype=np.int64)
+                X = self.encoder.encode_codes(np.stack([game.team1_codes for game in live]),
+                                              np.stack([game.team2_codes for game in live]),
+                                              np.array([game.map_code for game in live]),
+                                              states[:, 0], states[:, 1], states[:, 2])
+                win_proba = predict_win_proba(self.model, X, swap=self.swap)
+                self.stats['batches'] += 1
+                tick += 1
+
+                still_live = []
+                for game, (round_number, team1_score, team2_score), p in zip(live, states.tolist(), win_proba):
+                    self.stats['events'] += 1
+                    self.stats['seconds'] = time.perf_counter() - start
+                    yield ReplayEvent(game.game_id, game.map, round_number, team1_score, team2_score, float(p))
+                    game.next_round += 1
+                    if game.next_round < len(game.rounds):
+                        still_live.append(game)
+                    else:
+                        self.stats['games_finished'] += 1
+                live = still_live
+        finally:
+            self.stats['seconds'] = time.perf_counter() - start
+            games.close()
+
+
+def main(argv=None):
+    from feature_encoder import FeatureEncoder
+    from valorant_model import load_predictor
+
+    parser = argparse.ArgumentParser(description="Replay historical games as a stream of live predictions.")
+    parser.add_argument('database', help="path to valorant.sqlite")
+    parser.add_argument('--model', help="model artifact, compiled .npz or pickle "
+                                        "(default: the .valmodel artifact if present, else the pickle)")
+    parser.add_argument('--concurrent', type=int, default=32, help="games live at the same time")
+    parser.add_argument('--speed', type=float, default=0,
+                        help="replay speed multiplier against --round-seconds (0: as fast as possible)")
+    parser.add_argument('--round-seconds', type=float, default=100.0, help="nominal wall time of one round")
+    parser.add_argument('--chunk-size', type=int, default=500, help="Game_Rounds rows read per fetch")
+    parser.add_argument('--max-games', type=int, help="stop after this many games")
+    parser.add_argument('--symmetric', action='store_true', help="average each state with its team-swapped mirror")
+    parser.add_argument('--out', help="write every event to this JSON-lines file")
+    parser.add_argument('--report-every', type=float, default=5.0, help="seconds between progress lines")
+    args = parser.parse_args(argv)
+
+    model, columns, agents, maps = load_predictor(args.model)
+    engine = ReplayEngine(args.database, model, FeatureEncoder(agents, maps, columns),
+                          concurrent_games=args.concurrent, speed=args.speed, round_seconds=args.round_seconds,
+                          chunk_size=args.chunk_size, symmetric=args.symmetric, max_games=args.max_games)
+
+    out = open(args.out, 'w') if args.out else None
+    next_report = time.perf_counter() + args.report_every
+    try:
+        for event in engine.events():
+            if out is not None:
+                out.write(json.dumps(event._asdict()) + '\n')
+            if time.perf_counter() >= next_report:
+                next_report += args.report_every
+                print(f"{engine.stats['events']} events from {engine.stats['games_started']} games, "
+                      f"{engine.events_per_second:.0f} events/s")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out is not None:
+            out.close()
+    print(json.dumps({**engine.stats, 'events_per_second': engine.events_per_second}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
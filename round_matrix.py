@@ -0,0 +1,251 @@
+"""Compact round-level training matrix.
+
+merged_rounds_df repeats every game-level column once per round. RoundMatrix
+keeps the game-level block (both teams' agents and the map dummies, as
+uint8) once per game, and per round only the game's index plus the round
+number and scores as small unsigned ints. Dense float32 or SciPy sparse
+matrices in the model's column order are built on demand for fitting.
+
+swap_augment() adds the swapped orientation of each game (teams, their round
+scores and the label exchanged) as a view: row indices into the RoundMatrix
+plus a flag, applied through one column permutation when rows are
+materialized.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from feature_encoder import swap_permutation
+
+ROUND_COLUMNS = ['RoundNumber', 'Team1_RoundScore', 'Team2_RoundScore']
+ARRAY_FIELDS = ('game_ids', 'game_features', 'winner1', 'round_game', 'round_values')
+
+
+def _small_uint(values):
+    # Smallest unsigned type that holds every value (round numbers and scores)
+    values = np.asarray(values)
+    if len(values) and values.min() < 0:
+        raise ValueError("Round numbers and scores must not be negative")
+    return values.astype(np.min_scalar_type(int(values.max()) if len(values) else 0))
+
+
+class RoundMatrix:
+    def __init__(self, columns, game_ids, game_features, winner1, round_game, round_values):
+        self.columns = list(columns)
+        # Per game: GameID, uint8 team1/team2 agent and map block, and the label
+        self.game_ids = np.asarray(game_ids, dtype=str)
+        self.game_features = game_features
+        self.winner1 = np.asarray(winner1, dtype=bool)
+        # Per round: index into the game arrays, and RoundNumber/Team1_RoundScore/Team2_RoundScore
+        self.round_game = round_game
+        self.round_values = round_values
+
+        if game_features.shape[1] + len(ROUND_COLUMNS) != len(self.columns):
+            raise ValueError(f"{len(self.columns)} columns given for {game_features.shape[1]} game features "
+                             f"plus {len(ROUND_COLUMNS)} round values")
+
+    def __len__(self):
+        return len(self.round_game)
+
+    @property
+    def n_games(self):
+        return len(self.game_ids)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAY_FIELDS)
+
+    @property
+    def y(self):
+        return self.winner1[self.round_game]
+
+    @property
+    def round_game_ids(self):
+        return self.game_ids[self.round_game]
+
+    def _rows(self, rows):
+        return slice(None) if rows is None else rows
+
+    def to_dense(self, dtype=np.float32, rows=None):
+        """Materialize the rows (all by default) as a dense array in column order."""
+        rows = self._rows(rows)
+        round_values = self.round_values[rows]
+        X = np.empty((len(round_values), len(self.columns)), dtype=dtype)
+        X[:, :len(ROUND_COLUMNS)] = round_values
+        X[:, len(ROUND_COLUMNS):] = self.game_features[self.round_game[rows]]
+        return X
+
+    def to_sparse(self, dtype=np.float32, rows=None):
+        """Materialize the rows as a scipy.sparse CSR matrix in column order."""
+        try:
+            import scipy.sparse as sp
+        except ImportError:
+            raise ImportError("Sparse output requires scipy (pip install scipy)")
+        rows = self._rows(rows)
+        round_block = sp.csr_matrix(self.round_values[rows].astype(dtype))
+        game_block = sp.csr_matrix(self.game_features.astype(dtype))[self.round_game[rows]]
+        return sp.hstack([round_block, game_block], format='csr')
+
+    def to_frame(self):
+        """Return the rows as a DataFrame shaped like merged_rounds_df (GameID, features, Winner1)."""
+        df = pd.DataFrame(self.to_dense(np.int64), columns=self.columns)
+        df.insert(0, 'GameID', self.round_game_ids)
+        df['Winner1'] = self.y
+        return df
+
+    def select_games(self, game_ids):
+        """Return a RoundMatrix with only the given games and their rounds, e.g. for a GameID split."""
+        keep = np.isin(self.game_ids, np.asarray(game_ids, dtype=str))
+        new_index = np.cumsum(keep) - 1
+        round_keep = keep[self.round_game]
+        return RoundMatrix(self.columns, self.game_ids[keep], self.game_features[keep], self.winner1[keep],
+                           new_index[self.round_game[round_keep]].astype(np.int32),
+                           self.round_values[round_keep])
+
+    @classmethod
+    def concatenate(cls, matrices):
+        matrices = list(matrices)
+        if not matrices:
+            raise ValueError("Need at least one RoundMatrix to concatenate")
+        columns = matrices[0].columns
+        if any(m.columns != columns for m in matrices):
+            raise ValueError("Cannot concatenate round matrices with different columns")
+        offsets = np.cumsum([0] + [m.n_games for m in matrices[:-1]])
+        round_values = np.concatenate([m.round_values for m in matrices])
+        return cls(columns,
+                   np.concatenate([m.game_ids for m in matrices]),
+                   np.concatenate([m.game_features for m in matrices]),
+                   np.concatenate([m.winner1 for m in matrices]),
+                   np.concatenate([m.round_game + offset for m, offset in zip(matrices, offsets)]).astype(np.int32),
+                   _small_uint(round_values))
+
+    def save(self, path):
+        # The 0/1 game block is bit-packed on disk: 8 features per byte
+        np.savez(path,
+                 columns=np.asarray(self.columns, dtype=str),
+                 game_ids=self.game_ids,
+                 game_features=np.packbits(self.game_features, axis=1),
+                 winner1=self.winner1,
+                 round_game=self.round_game,
+                 round_values=self.round_values)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            columns = data['columns'].tolist()
+            n_game_features = len(columns) - len(ROUND_COLUMNS)
+            game_features = np.unpackbits(data['game_features'], axis=1, count=n_game_features)
+            return cls(columns, data['game_ids'], game_features, data['winner1'],
+                       data['round_game'], data['round_values'])
+
+    def save_arrays(self, directory):
+        # One plain .npy per array, so other processes can memory-map them
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, 'columns.json'), 'w') as f:
+            json.dump(self.columns, f)
+        for name in ARRAY_FIELDS:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+
+    @classmethod
+    def open_arrays(cls, directory, mmap_mode='r'):
+        """Open a save_arrays() directory; with mmap_mode='r' nothing is read until used."""
+        with open(os.path.join(directory, 'columns.json')) as f:
+            columns = json.load(f)
+        arrays = {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in ARRAY_FIELDS}
+        return cls(columns, **arrays)
+
+
+def build_round_matrix(paired, rounds_df, maps=None):
+    """Combine a team_pairing.PairedGames with parsed round scores into a RoundMatrix.
+
+    Games without rounds are dropped; maps fixes the Map_* columns (by
+    default, the maps present in paired, as the notebook does).
+    """
+    maps = paired.maps if maps is None else list(maps)
+    columns = (ROUND_COLUMNS
+               + [f'team1_{agent}' for agent in paired.agents]
+               + [f'team2_{agent}' for agent in paired.agents]
+               + [f'Map_{m}' for m in maps])
+
+    rounds_game = pd.Index(paired.game_ids).get_indexer(rounds_df['GameID'])
+    rounds_df = rounds_df[rounds_game >= 0]
+    rounds_game = rounds_game[rounds_game >= 0]
+
+    # Renumber the games that have rounds, keeping paired's order
+    has_rounds = np.zeros(len(paired), dtype=bool)
+    has_rounds[rounds_game] = True
+    new_index = np.cumsum(has_rounds) - 1
+
+    game_features = np.hstack([paired.team1_agents, paired.team2_agents, paired.map_matrix(maps)])
+    round_values = _small_uint(rounds_df[ROUND_COLUMNS].to_numpy())
+    return RoundMatrix(columns,
+                       paired.game_ids[has_rounds],
+                       game_features[has_rounds],
+                       paired.winner1[has_rounds],
+                       new_index[rounds_game].astype(np.int32),
+                       round_values)
+
+
+class AugmentedRounds:
+    """Rows of a RoundMatrix, each in its original or its team-swapped orientation."""
+
+    def __init__(self, matrix, rows, flipped):
+        self.matrix = matrix
+        self.columns = matrix.columns
+        # Round index into matrix for every row, and whether that row has its teams swapped
+        self.rows = rows
+        self.flipped = flipped
+        self.permutation = swap_permutation(self.columns)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def y(self):
+        # Swapping the teams swaps the winner
+        return self.matrix.y[self.rows] ^ self.flipped
+
+    @property
+    def round_game_ids(self):
+        return self.matrix.round_game_ids[self.rows]
+
+    def to_dense(self, dtype=np.float32, rows=None):
+        selected = slice(None) if rows is None else rows
+        flipped = self.flipped[selected]
+        X = self.matrix.to_dense(dtype, rows=self.rows[selected])
+        # Swap column pairs in place; the permutation covers agents and round scores alike
+        for i, j in enumerate(self.permutation):
+            if j > i:
+                column = X[flipped, i]
+                X[flipped, i] = X[flipped, j]
+                X[flipped, j] = column
+        return X
+
+    def to_frame(self):
+        df = pd.DataFrame(self.to_dense(np.int64), columns=self.columns)
+        df.insert(0, 'GameID', self.round_game_ids)
+        df['Winner1'] = self.y
+        return df
+
+
+def swap_augment(matrix, mode='both', seed=0, rows=None):
+    """Return an AugmentedRounds view over `rows` of matrix (all rounds by default).
+
+    mode 'both' emits every round twice, first as stored and then with the
+    teams swapped, so each matchup is seen symmetrically. 'random' keeps one
+    orientation per game, picked with `seed` (the notebook's swap_teams), and
+    'none' keeps every row as stored. No feature values are copied.
+    """
+    rows = np.arange(len(matrix)) if rows is None else np.asarray(rows)
+    if mode == 'both':
+        return AugmentedRounds(matrix, np.concatenate([rows, rows]), np.repeat([False, True], len(rows)))
+    if mode == 'random':
+        # One draw per game, so all rounds of a game share an orientation
+        flip_game = np.random.default_rng(seed).random(matrix.n_games) > 0.5
+        return AugmentedRounds(matrix, rows, flip_game[matrix.round_game[rows]])
+    if mode == 'none':
+        return AugmentedRounds(matrix, rows, np.zeros(len(rows), dtype=bool))
+    raise ValueError(f"Unknown augmentation mode '{mode}', expected 'both', 'random' or 'none'")
@@ -0,0 +1,215 @@
+"""Streaming parser for the RoundHistory column of Game_Rounds.
+
+Reads Game_Rounds from SQLite in chunks, parses the chunks across a process
+pool and returns the round scores as columnar arrays, ready for
+pd.DataFrame(result.columns). Rows that can't be parsed are counted, not
+silently dropped.
+
+RoundHistory is usually a Python dict literal. Only the round numbers and
+ScoreAfterRound are needed, so those are pulled out with a regex. JSON goes
+through json.loads, and anything the fast paths can't vouch for falls back to
+ast.literal_eval, the same parse the notebook used.
+"""
+import ast
+import json
+import os
+import re
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# One round entry, e.g. 1: {'RoundWinner': 'TL', 'ScoreAfterRound': '1-0', ...}
+ROUND_ENTRY = re.compile(r"""['"]?(\d+)['"]?\s*:\s*\{([^{}]*)\}""")
+SCORE_FIELD = re.compile(r"""['"]ScoreAfterRound['"]\s*:\s*(?:['"]([^'"]*)['"]|None|null)""")
+
+COLUMNS = ('GameID', 'RoundNumber', 'Team1_RoundScore', 'Team2_RoundScore')
+
+
+class RoundHistories:
+    def __init__(self, columns, stats):
+        # GameID, RoundNumber, Team1_RoundScore, Team2_RoundScore arrays
+        self.columns = columns
+        # rows_read, rows_parsed, rows_rejected, json_rows, regex_rows, literal_rows, duplicate_rows
+        self.stats = stats
+
+    def __len__(self):
+        return len(self.columns['GameID'])
+
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame(self.columns)
+
+
+def parse_score(score):
+    # Same outcome as the notebook's split('-') + to_numeric(errors='coerce') + fillna(0)
+    parts = score.split('-') if isinstance(score, str) else ()
+    values = []
+    for i in range(2):
+        try:
+            values.append(int(parts[i]))
+        except (IndexError, ValueError):
+            values.append(0)
+    return values
+
+
+def _parse_regex(text):
+    # Trust the regex only if it saw every round dict: one '{' for the outer
+    # dict plus one per round, and no repeated round numbers
+    entries = ROUND_ENTRY.findall(text)
+    if not entries or text.count('{') != len(entries) + 1:
+        return None
+    rounds = []
+    for round_number, body in entries:
+        match = SCORE_FIELD.search(body)
+        rounds.append((int(round_number), *parse_score(match.group(1) if match else None)))
+    if len({r[0] for r in rounds}) != len(rounds):
+        return None
+    return rounds
+
+
+def _rounds_from_dict(history):
+    rounds = []
+    for round_number, round_info in history.items():
+        score = round_info.get('ScoreAfterRound') if isinstance(round_info, dict) else None
+        rounds.append((int(round_number), *parse_score(score)))
+    return rounds
+
+
+def parse_history(text):
+    """Parse one RoundHistory blob into (round, score1, score2) tuples.
+
+    Returns (rounds, method), or (None, None) if the blob can't be parsed.
+    """
+    if not isinstance(text, str):
+        return None, None
+    stripped = text.lstrip()
+    if stripped.startswith('{"'):
+        try:
+            return _rounds_from_dict(json.loads(stripped)), 'json'
+        except (ValueError, AttributeError, TypeError):
+            pass
+    rounds = _parse_regex(text)
+    if rounds is not None:
+        return rounds, 'regex'
+    for loads in (ast.literal_eval, json.loads):
+        try:
+            return _rounds_from_dict(loads(text)), 'literal'
+        except (SyntaxError, ValueError, AttributeError, TypeError, MemoryError, RecursionError):
+            continue
+    return None, None
+
+
+def parse_chunk(rows):
+    """Parse a list of (GameID, RoundHistory) rows into columnar arrays plus counts."""
+    game_ids, row_index, parsed = [], [], []
+    counts = {'rows_parsed': 0, 'rows_rejected': 0, 'json_rows': 0, 'regex_rows': 0, 'literal_rows': 0}
+    for i, (game_id, text) in enumerate(rows):
+        rounds, method = parse_history(text)
+        if rounds is None:
+            counts['rows_rejected'] += 1
+            continue
+        counts['rows_parsed'] += 1
+        counts[f'{method}_rows'] += 1
+        game_ids.extend([game_id] * len(rounds))
+        row_index.extend([i] * len(rounds))
+        parsed.extend(rounds)
+
+    values = np.array(parsed, dtype=np.int32).reshape(-1, 3)
+    return {
+        'GameID': np.array(game_ids, dtype=object),
+        'row': np.array(row_index, dtype=np.int64),
+        'RoundNumber': values[:, 0],
+        'Team1_RoundScore': values[:, 1],
+        'Team2_RoundScore': values[:, 2],
+    }, counts
+
+
+def iter_round_rows(db_path, chunk_size=5000, game_ids=None):
+    # A plain cursor streams rows, so the table is never fully in memory
+    conn = sqlite3.connect(db_path)
+    try:
+        if game_ids is None:
+            cursor = conn.execute("SELECT GameID, RoundHistory FROM Game_Rounds")
+        else:
+            # Filter inside SQLite so unwanted RoundHistory blobs are never fetched
+            conn.execute("CREATE TEMP TABLE wanted_games (GameID TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO wanted_games VALUES (?)", ((g,) for g in game_ids))
+            cursor = conn.execute("SELECT GameID, RoundHistory FROM Game_Rounds "
+                                  "WHERE CAST(GameID AS TEXT) IN (SELECT GameID FROM wanted_games)")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [(str(game_id), text) for game_id, text in rows]
+    finally:
+        conn.close()
+
+
+def _combine(parts, offsets):
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS}
+    # Global source-row number for every round, to resolve games that appear twice
+    columns['row'] = np.concatenate([part['row'] + offset for part, offset in zip(parts, offsets)])
+    return columns
+
+
+def parse_round_histories(db_path, game_ids=None, chunk_size=5000, workers=None):
+    """Parse Game_Rounds.RoundHistory from `db_path` into a RoundHistories.
+
+    game_ids optionally limits parsing to those games. workers defaults to the
+    CPU count; 0 or 1 parses in this process. If a game appears more than once,
+    its last row wins, as it did with the notebook's dict.
+    """
+    if game_ids is not None:
+        game_ids = {str(game_id) for game_id in game_ids}
+    workers = os.cpu_count() if workers is None else workers
+
+    stats = {'rows_read': 0, 'rows_parsed': 0, 'rows_rejected': 0,
+             'json_rows': 0, 'regex_rows': 0, 'literal_rows': 0, 'duplicate_rows': 0}
+    parts, offsets = [], []
+
+    def collect(result, offset):
+        part, counts = result
+        parts.append(part)
+        offsets.append(offset)
+        for key, value in counts.items():
+            stats[key] += value
+
+    offset = 0
+    chunks = iter_round_rows(db_path, chunk_size, game_ids)
+    if workers <= 1:
+        for rows in chunks:
+            stats['rows_read'] += len(rows)
+            collect(parse_chunk(rows), offset)
+            offset += len(rows)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Keep a bounded number of chunks in flight so memory stays flat
+            in_flight = deque()
+            for rows in chunks:
+                stats['rows_read'] += len(rows)
+                in_flight.append((executor.submit(parse_chunk, rows), offset))
+                offset += len(rows)
+                if len(in_flight) >= 2 * workers:
+                    future, chunk_offset = in_flight.popleft()
+                    collect(future.result(), chunk_offset)
+            while in_flight:
+                future, chunk_offset = in_flight.popleft()
+                collect(future.result(), chunk_offset)
+
+    if not any(len(part['GameID']) for part in parts):
+        empty = {name: np.zeros(0, dtype=object if name == 'GameID' else np.int32) for name in COLUMNS}
+        return RoundHistories(empty, stats)
+
+    columns = _combine(parts, offsets)
+
+    # Keep only the last source row of each game
+    _, game_index = np.unique(columns['GameID'], return_inverse=True)
+    last_row = np.full(game_index.max() + 1, -1, dtype=np.int64)
+    np.maximum.at(last_row, game_index, columns['row'])
+    keep = columns['row'] == last_row[game_index]
+    stats['duplicate_rows'] = len(np.unique(columns['row'][~keep]))
+    columns.pop('row')
+    columns = {name: values[keep] for name, values in columns.items()}
+    return RoundHistories(columns, stats)
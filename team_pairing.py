@@ -0,0 +1,123 @@
+"""Vectorized team pairing and agent one-hot encoding for the training data.
+
+Produces the notebook's final_df2 without pivot_table(aggfunc=set), per-row
+encode_agents lambdas or a self-merge. Agents are mapped to integer codes
+once, then each team's agents are scattered into a uint8 matrix with one row
+per (GameID, TeamAbbreviation).
+"""
+import numpy as np
+import pandas as pd
+
+
+def multi_hot(agent_sets, agents):
+    """One row per element of agent_sets, with a 1 in the column of every agent it contains."""
+    exploded = pd.Series(agent_sets).reset_index(drop=True).explode()
+    codes = pd.Categorical(exploded, categories=agents).codes
+    rows = exploded.index.to_numpy()
+    known = codes >= 0
+    matrix = np.zeros((len(agent_sets), len(agents)), dtype=np.uint8)
+    matrix[rows[known], codes[known]] = 1
+    return matrix
+
+
+def team_agent_matrix(scoreboard, agents=None):
+    """Group scoreboard rows by (GameID, TeamAbbreviation) into agent multi-hot rows.
+
+    Returns (teams, matrix, agents): teams is a sorted MultiIndex, like the
+    index of the notebook's pivot table, and matrix the matching uint8 rows.
+    Without an agent list, every agent in the scoreboard except '' is used.
+    """
+    if agents is None:
+        agents = sorted(set(scoreboard['Agent'].dropna()) - {''})
+    agents = list(agents)
+
+    team_codes, teams = pd.factorize(pd.MultiIndex.from_frame(scoreboard[['GameID', 'TeamAbbreviation']]),
+                                     sort=True)
+    teams = teams.set_names(['GameID', 'TeamAbbreviation'])
+    agent_codes = pd.Categorical(scoreboard['Agent'], categories=agents).codes
+    known = (team_codes >= 0) & (agent_codes >= 0)
+
+    matrix = np.zeros((len(teams), len(agents)), dtype=np.uint8)
+    matrix[team_codes[known], agent_codes[known]] = 1
+    return teams, matrix, agents
+
+
+class PairedGames:
+    def __init__(self, game_ids, info, team1_agents, team2_agents, agents, winner1):
+        self.game_ids = game_ids
+        # Team1ID, Team1, Team2ID, Team2 and Map columns from the Games table
+        self.info = info
+        # uint8 (n_games, n_agents) multi-hot blocks
+        self.team1_agents = team1_agents
+        self.team2_agents = team2_agents
+        self.agents = agents
+        self.winner1 = winner1
+
+    def __len__(self):
+        return len(self.game_ids)
+
+    @property
+    def maps(self):
+        # The notebook's category dtype: every map that occurs, sorted
+        return sorted(self.info['Map'].dropna().unique())
+
+    def map_matrix(self, maps=None):
+        maps = self.maps if maps is None else list(maps)
+        codes = pd.Categorical(self.info['Map'], categories=maps).codes
+        matrix = np.zeros((len(self), len(maps)), dtype=np.uint8)
+        known = codes >= 0
+        matrix[np.flatnonzero(known), codes[known]] = 1
+        return matrix
+
+    def to_frame(self):
+        """Return the games laid out exactly like the notebook's final_df2."""
+        def agent_block(prefix, matrix):
+            return pd.DataFrame(matrix.astype(np.int64), columns=[f'{prefix}_{a}' for a in self.agents])
+
+        info = self.info.reset_index(drop=True)
+        maps = self.maps
+        frame = pd.concat([
+            pd.DataFrame({'GameID': self.game_ids}),
+            info[['Team1ID', 'Team1']],
+            agent_block('team1', self.team1_agents),
+            info[['Team2ID', 'Team2']],
+            agent_block('team2', self.team2_agents),
+            pd.DataFrame(self.map_matrix(maps).astype(bool), columns=[f'Map_{m}' for m in maps]),
+        ], axis=1)
+        frame['Winner1'] = self.winner1
+        return frame
+
+
+def pair_games(scoreboard, games, agents=None, game_ids=None):
+    """Pair both teams of every game into one row, as the notebook's final_df2.
+
+    Keeps games with exactly two teams on the scoreboard where exactly one of
+    Team1/Team2 is the winner. The first team in TeamAbbreviation order is
+    team1, like RowPosition 0 in the notebook. game_ids optionally limits the
+    result to those games (the notebook keeps only games with round data).
+    """
+    teams, matrix, agents = team_agent_matrix(scoreboard, agents)
+
+    # Teams are sorted by GameID, so each game's teams are adjacent
+    team_game_ids = teams.get_level_values('GameID')
+    game_codes, unique_game_ids = pd.factorize(team_game_ids, sort=True)
+    counts = np.bincount(game_codes, minlength=len(unique_game_ids))
+    first_team = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    two_teams = counts == 2
+    first_team = first_team[two_teams]
+    candidate_ids = unique_game_ids[two_teams]
+
+    info = games.drop_duplicates('GameID').set_index('GameID').reindex(candidate_ids)
+    team1_won = (info['Team1'] == info['Winner']).to_numpy()
+    team2_won = (info['Team2'] == info['Winner']).to_numpy()
+    keep = team1_won != team2_won
+    if game_ids is not None:
+        keep &= candidate_ids.isin(game_ids)
+
+    first_team = first_team[keep]
+    return PairedGames(game_ids=np.asarray(candidate_ids[keep]),
+                       info=info.loc[keep, ['Team1ID', 'Team1', 'Team2ID', 'Team2', 'Map']],
+                       team1_agents=matrix[first_team],
+                       team2_agents=matrix[first_team + 1],
+                       agents=agents,
+                       winner1=team1_won[keep])
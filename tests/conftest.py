@@ -0,0 +1,37 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The modules are top-level scripts in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from feature_encoder import EXPECTED_COLUMN_ORDER  # noqa: E402
+
+
+def random_rows(n, seed=0):
+    """Rows shaped like real model input: round and scores, then 0/1 agent and map columns."""
+    rng = np.random.default_rng(seed)
+    X = rng.integers(0, 2, size=(n, len(EXPECTED_COLUMN_ORDER))).astype(np.float32)
+    X[:, 0] = rng.integers(1, 25, size=n)
+    X[:, 1:3] = rng.integers(0, 13, size=(n, 2))
+    return X
+
+
+def fit_model(seed=0, n_estimators=20):
+    from sklearn.ensemble import GradientBoostingClassifier
+
+    X = random_rows(2000, seed)
+    # Team 1 tends to win when ahead, with some agent effects, so the trees have real splits
+    logit = 0.4 * (X[:, 1] - X[:, 2]) + X[:, 3] - X[:, 20] + np.random.default_rng(seed).normal(size=len(X))
+    model = GradientBoostingClassifier(n_estimators=n_estimators, max_depth=3, random_state=seed)
+    # A DataFrame, so the model carries its column order like the notebook's
+    model.fit(pd.DataFrame(X, columns=EXPECTED_COLUMN_ORDER), logit > 0)
+    return model
+
+
+@pytest.fixture(scope='session')
+def sklearn_model():
+    return fit_model()
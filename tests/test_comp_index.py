@@ -0,0 +1,91 @@
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from comp_index import CompIndex, build_comp_index, build_hash_table
+
+AGENTS = ['astra', 'breach', 'jett', 'omen', 'sage', 'sova', 'viper']
+MAPS = ['Ascent', 'Bind', 'Haven']
+
+
+@pytest.fixture(scope='module')
+def tables():
+    # Few agents, so comps and matchups repeat; some games have no known map
+    rng = random.Random(0)
+    scoreboard, games = [], []
+    for game in range(600):
+        game_id = str(1000 + game)
+        team1, team2 = sorted(rng.sample([f'T{i}' for i in range(8)], 2))
+        games.append({'GameID': game_id, 'Team1ID': team1, 'Team1': team1, 'Team2ID': team2, 'Team2': team2,
+                      'Winner': rng.choice([team1, team2]), 'Map': rng.choice(MAPS + [None])})
+        # Every tenth game is a mirror
+        comp1 = rng.sample(AGENTS, 5)
+        comp2 = comp1 if game % 10 == 0 else rng.sample(AGENTS, 5)
+        for team, comp in ((team1, comp1), (team2, comp2)):
+            scoreboard += [{'GameID': game_id, 'TeamAbbreviation': team, 'Agent': agent} for agent in comp]
+    return pd.DataFrame(scoreboard), pd.DataFrame(games)
+
+
+@pytest.fixture(scope='module')
+def naive(tables):
+    # One row per game and team, counted with a plain groupby
+    scoreboard, games = tables
+    comps = scoreboard.groupby(['GameID', 'TeamAbbreviation'])['Agent'].agg(frozenset).rename('Comp').reset_index()
+    rows = comps.merge(games, on='GameID')
+    rows['Won'] = rows['TeamAbbreviation'] == rows['Winner']
+    rows['Opponent'] = rows.apply(lambda r: comps[(comps.GameID == r.GameID)
+                                                  & (comps.TeamAbbreviation != r.TeamAbbreviation)].Comp.iloc[0],
+                                  axis=1)
+    return rows
+
+
+def test_comp_stats_match_groupby(tables, naive):
+    index = build_comp_index(*tables)
+    for (comp, map_name), group in naive.groupby(['Comp', 'Map'], dropna=False):
+        games, wins = len(group), int(group['Won'].sum())
+        if not pd.isna(map_name):
+            assert index.comp_stats(comp, map_name) == (games, wins)
+    for comp, group in naive.groupby('Comp'):
+        assert index.comp_stats(comp) == (len(group), int(group['Won'].sum()))
+
+
+def test_matchup_stats_match_groupby(tables, naive):
+    index = build_comp_index(*tables)
+    for (comp, opponent), group in naive.groupby(['Comp', 'Opponent']):
+        games = len(group) if comp != opponent else len(group) // 2
+        wins = int(group['Won'].sum()) if comp != opponent else games / 2
+        assert index.matchup_stats(comp, opponent) == (games, wins)
+        for map_name, on_map in group.groupby('Map'):
+            if comp != opponent:
+                assert index.matchup_stats(comp, opponent, map_name) == (len(on_map), int(on_map['Won'].sum()))
+
+
+def test_missing_lookups(tables):
+    index = build_comp_index(*tables)
+    assert index.comp_stats(['jett', 'raze']) == (0, 0)
+    assert index.comp_stats(AGENTS[:5], 'Lotus') == (0, 0)
+    assert index.matchup_stats(AGENTS[:5], ['jett', 'raze']) == (0, 0)
+
+
+def test_save_and_load(tables, tmp_path):
+    index = build_comp_index(*tables)
+    index.save(str(tmp_path / 'comp_index'))
+    loaded = CompIndex.load(str(tmp_path / 'comp_index'))
+    for comp in (AGENTS[:5], AGENTS[2:], AGENTS[1:6]):
+        assert loaded.comp_stats(comp, 'Bind') == index.comp_stats(comp, 'Bind')
+        assert loaded.matchup_stats(comp, AGENTS[:5]) == index.matchup_stats(comp, AGENTS[:5])
+
+
+def test_hash_table_probing_finds_every_key():
+    # Thousands of keys, so plenty of them share a home slot and are only found by probing
+    rng = np.random.default_rng(0)
+    keys = np.unique(rng.integers(0, 1 << 40, size=5000, dtype=np.uint64) << np.uint64(20))
+    values = np.stack([np.arange(len(keys)), np.arange(len(keys)) * 2], axis=1).astype(np.uint32)
+    table_keys, table_values = build_hash_table(keys, values)
+
+    index = CompIndex([], [], table_keys, table_values, table_keys, table_values)
+    for i, key in enumerate(keys.tolist()):
+        assert index._lookup(table_keys, table_values, key) == (i, 2 * i)
+    assert index._lookup(table_keys, table_values, 12345) == (0, 0)
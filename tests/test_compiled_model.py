@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from compiled_model import CompiledGradientBoosting, compile_model, max_abs_difference
+from conftest import fit_model, random_rows
+from valorant_model import load_model
+
+# Comparisons feed plain arrays to a model fitted on a DataFrame, like every caller in the repo
+pytestmark = pytest.mark.filterwarnings("ignore:X does not have valid feature names")
+
+
+def test_matches_sklearn(sklearn_model):
+    assert max_abs_difference(sklearn_model, compile_model(sklearn_model)) < 1e-9
+
+
+def test_matches_sklearn_on_model_rows(sklearn_model):
+    compiled = compile_model(sklearn_model)
+    X = random_rows(5000, seed=1)
+    np.testing.assert_allclose(compiled.predict_proba(X), sklearn_model.predict_proba(X), rtol=0, atol=1e-12)
+    np.testing.assert_array_equal(compiled.predict(X), sklearn_model.predict(X))
+
+
+def test_few_and_many_trees():
+    for model in (fit_model(seed=2, n_estimators=5), fit_model(seed=3, n_estimators=60)):
+        assert max_abs_difference(model, compile_model(model), n_samples=2000) < 1e-9
+
+
+def test_npz_round_trip(sklearn_model, tmp_path):
+    compiled = compile_model(sklearn_model)
+    path = str(tmp_path / 'model.npz')
+    compiled.save(path)
+
+    loaded = CompiledGradientBoosting.load(path)
+    X = random_rows(500, seed=4)
+    np.testing.assert_array_equal(loaded.predict_proba(X), compiled.predict_proba(X))
+    assert list(loaded.feature_names_in_) == list(sklearn_model.feature_names_in_)
+    assert isinstance(load_model(path), CompiledGradientBoosting)
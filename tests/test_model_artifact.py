@@ -0,0 +1,76 @@
+import struct
+
+import numpy as np
+import pytest
+
+from compiled_model import compile_model
+from conftest import random_rows
+from model_artifact import FORMAT_VERSION, PREFIX, load_artifact, read_header, save_artifact
+from valorant_model import load_predictor, schema_from_model
+
+
+@pytest.fixture
+def artifact_path(sklearn_model, tmp_path):
+    path = str(tmp_path / 'model.valmodel')
+    columns, agents, maps = schema_from_model(sklearn_model)
+    save_artifact(path, compile_model(sklearn_model), columns, agents, maps, metadata={'source': 'test'})
+    return path
+
+
+def _rewrite(path, offset, data):
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        f.write(data)
+
+
+def test_round_trip(sklearn_model, artifact_path):
+    artifact = load_artifact(artifact_path)
+    columns, agents, maps = schema_from_model(sklearn_model)
+    assert (artifact.columns, artifact.agents, artifact.maps) == (columns, agents, maps)
+    assert artifact.metadata == {'source': 'test'}
+
+    X = random_rows(1000, seed=5)
+    np.testing.assert_array_equal(artifact.model.predict_proba(X), compile_model(sklearn_model).predict_proba(X))
+    assert isinstance(artifact.model.split_feature, np.memmap)
+
+
+def test_load_predictor_reads_the_schema(sklearn_model, artifact_path):
+    model, columns, agents, maps = load_predictor(artifact_path)
+    assert (columns, agents, maps) == schema_from_model(sklearn_model)
+
+
+def test_tampered_payload_fails_checksum(artifact_path):
+    _, payload_offset = read_header(artifact_path)
+    with open(artifact_path, 'rb') as f:
+        f.seek(payload_offset + 100)
+        byte = f.read(1)
+    _rewrite(artifact_path, payload_offset + 100, bytes([byte[0] ^ 0xFF]))
+
+    with pytest.raises(ValueError, match='checksum'):
+        load_artifact(artifact_path)
+    # Skipping verification trusts the bytes as they are
+    load_artifact(artifact_path, verify=False)
+
+
+def test_rejects_bad_magic_version_and_truncation(artifact_path, tmp_path):
+    with open(artifact_path, 'rb') as f:
+        original = f.read()
+
+    _rewrite(artifact_path, 0, b'NOTMODEL')
+    with pytest.raises(ValueError, match='not a model artifact'):
+        load_artifact(artifact_path)
+
+    _rewrite(artifact_path, 0, original[:8] + struct.pack('<I', FORMAT_VERSION + 1))
+    with pytest.raises(ValueError, match='artifact format'):
+        load_artifact(artifact_path)
+
+    truncated = tmp_path / 'short.valmodel'
+    truncated.write_bytes(original[:PREFIX.size - 1])
+    with pytest.raises(ValueError, match='too short'):
+        load_artifact(str(truncated))
+
+
+def test_column_count_must_match(sklearn_model, tmp_path):
+    columns, agents, maps = schema_from_model(sklearn_model)
+    with pytest.raises(ValueError, match='features'):
+        save_artifact(str(tmp_path / 'bad.valmodel'), compile_model(sklearn_model), columns[:-1], agents, maps)
@@ -0,0 +1,175 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import model_registry
+from compiled_model import compile_model
+from conftest import fit_model
+from feature_encoder import FeatureEncoder
+from model_registry import ModelRegistry
+from valorant_model import load_predictor, predict_win_proba
+
+STATE = (['jett', 'sova', 'omen', 'killjoy', 'skye'], ['raze', 'breach', 'viper', 'cypher', 'astra'], 'Bind', 5, 3, 1)
+
+
+@pytest.fixture(scope='module')
+def model_files(sklearn_model, tmp_path_factory):
+    # Two models with different weights, as compiled .npz files
+    directory = tmp_path_factory.mktemp('sources')
+    paths = {}
+    for name, model in (('first', sklearn_model), ('second', fit_model(seed=7))):
+        paths[name] = str(directory / f'{name}.npz')
+        compile_model(model).save(paths[name])
+    return paths
+
+
+def install(source, directory, name, routing=None):
+    # Copy beside the target and rename into place, as the registry expects
+    path = os.path.join(directory, name)
+    shutil.copy(source, path + '.part')
+    os.replace(path + '.part', path)
+    if routing is not None:
+        with open(os.path.splitext(path)[0] + '.json', 'w') as f:
+            json.dump(routing, f)
+    return path
+
+
+def corrupt(directory, name):
+    path = os.path.join(directory, name)
+    with open(path + '.part', 'wb') as f:
+        f.write(b'not a model')
+    os.replace(path + '.part', path)
+
+
+def direct(path, state, symmetric=False):
+    model, columns, agents, maps = load_predictor(path)
+    encoder = FeatureEncoder(agents, maps, columns)
+    return predict_win_proba(model, encoder.encode_many([state]),
+                             swap=encoder.swap_permutation if symmetric else None)[0]
+
+
+def test_route_precedence(model_files, tmp_path):
+    source = model_files['first']
+    install(source, tmp_path, 'default.npz')
+    install(source, tmp_path, 'ascent.npz', {'maps': ['Ascent']})
+    install(source, tmp_path, 'ascent_preferred.npz', {'maps': ['Ascent'], 'priority': 5})
+    install(source, tmp_path, 'era.npz', {'eras': ['2023']})
+    install(source, tmp_path, 'ascent_2023.npz', {'maps': ['Ascent'], 'eras': ['2023']})
+    install(source, tmp_path, 'bind_a.npz', {'maps': ['Bind']})
+    install(source, tmp_path, 'bind_b.npz', {'maps': ['Bind']})
+    registry = ModelRegistry(str(tmp_path), log=lambda message: None)
+    assert registry.refresh()
+
+    def route(map_name, era=None):
+        return registry.spec_for(map_name, era).name
+
+    # Map and era beat one of them, which beats a catch-all; then priority, then name
+    assert route('Ascent', '2023') == 'ascent_2023'
+    assert route('Ascent') == 'ascent_preferred'
+    assert route('Ascent', '2022') == 'ascent_preferred'
+    assert route('Haven', 2023) == 'era'
+    assert route('Haven') == 'default'
+    assert route('Bind') == 'bind_a'
+
+
+def test_predict_matches_direct_and_isolates_unroutable_states(model_files, tmp_path):
+    ascent = install(model_files['first'], tmp_path, 'ascent.npz', {'maps': ['Ascent']})
+    bind = install(model_files['second'], tmp_path, 'bind.npz', {'maps': ['Bind']})
+    registry = ModelRegistry(str(tmp_path), log=lambda message: None)
+    registry.refresh()
+
+    states = [STATE[:2] + ('Ascent',) + STATE[3:], STATE, STATE[:2] + ('Haven',) + STATE[3:]]
+    errors = {}
+    win_proba = registry.predict(states, symmetric=True, errors=errors)
+    assert win_proba[0] == pytest.approx(direct(ascent, states[0], symmetric=True), abs=1e-12)
+    assert win_proba[1] == pytest.approx(direct(bind, states[1], symmetric=True), abs=1e-12)
+    assert np.isnan(win_proba[2]) and list(errors) == [2]
+    with pytest.raises(ValueError, match="No model serves map 'Haven'"):
+        registry.predict(states)
+
+
+def test_failed_replacement_keeps_previous_version(model_files, tmp_path):
+    install(model_files['first'], tmp_path, 'default.npz')
+    logs = []
+    registry = ModelRegistry(str(tmp_path), log=logs.append)
+    registry.refresh()
+    before = registry.predict([STATE])[0]
+
+    corrupt(tmp_path, 'default.npz')
+    logs.clear()
+    assert not registry.refresh()
+    assert not registry.refresh()
+    assert len(logs) == 1 and 'keeping the previous version' in logs[0]
+    assert registry.predict([STATE])[0] == before
+
+    path = install(model_files['second'], tmp_path, 'default.npz')
+    assert registry.refresh()
+    assert registry.predict([STATE])[0] == pytest.approx(direct(path, STATE), abs=1e-12)
+
+
+def test_eviction_never_reloads_a_replaced_file(model_files, tmp_path):
+    install(model_files['first'], tmp_path, 'ascent.npz', {'maps': ['Ascent']})
+    install(model_files['first'], tmp_path, 'other.npz')
+    registry = ModelRegistry(str(tmp_path), max_models=1, log=lambda message: None)
+    registry.refresh()
+    ascent = registry.route('Ascent')
+
+    # A broken replacement is rejected, and loading another model must not evict the old one
+    corrupt(tmp_path, 'ascent.npz')
+    registry.refresh()
+    registry.route('Bind')
+    assert registry.route('Ascent') is ascent
+
+    # A valid replacement only serves once refresh() installs it
+    install(model_files['second'], tmp_path, 'ascent.npz')
+    assert registry.route('Ascent') is ascent
+    assert registry.refresh()
+    assert registry.route('Ascent') is not ascent
+
+    # Once installed, models are evicted down to max_models again
+    registry.route('Bind')
+    assert len(registry._cache) == 1
+
+
+def test_cache_limits(model_files, tmp_path, monkeypatch):
+    for name in ('a.npz', 'b.npz', 'c.npz'):
+        install(model_files['first'], tmp_path, name, {'maps': [name[0]]})
+    loads = []
+    monkeypatch.setattr(model_registry, 'load_predictor',
+                        lambda path: loads.append(path) or load_predictor(path))
+    registry = ModelRegistry(str(tmp_path), max_models=2, log=lambda message: None)
+    registry.refresh()
+    assert len(registry._cache) == 2
+
+    # The vocabulary was recorded when each model loaded, so it loads nothing
+    loads.clear()
+    agents, maps = registry.vocabulary()
+    assert loads == [] and 'jett' in agents and 'Ascent' in maps
+
+    registry = ModelRegistry(str(tmp_path), max_models=8, max_bytes=1, log=lambda message: None)
+    registry.refresh()
+    assert len(registry._cache) == 1
+
+
+def test_route_memo_is_bounded(model_files, tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, 'MAX_CACHED_ROUTES', 10)
+    install(model_files['first'], tmp_path, 'default.npz')
+    registry = ModelRegistry(str(tmp_path), log=lambda message: None)
+    registry.refresh()
+    for era in range(100):
+        assert registry.spec_for('Ascent', str(era)).name == 'default'
+    assert len(registry._table._routes) == 10
+
+
+@pytest.mark.parametrize('routing', [{'priority': None}, {'priority': [1]}, {'maps': 'Ascent'}, ['Ascent']])
+def test_bad_sidecar_skips_the_model(model_files, tmp_path, routing):
+    install(model_files['first'], tmp_path, 'default.npz')
+    install(model_files['first'], tmp_path, 'bad.npz', routing)
+    logs = []
+    registry = ModelRegistry(str(tmp_path), log=logs.append)
+    registry.refresh()
+    assert registry.models == ['default']
+    assert any("Could not read model" in message for message in logs)
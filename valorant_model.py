@@ -0,0 +1,92 @@
+import os
+import pickle
+import warnings
+
+import numpy as np
+
+import profiling
+from feature_encoder import EXPECTED_COLUMN_ORDER
+
+# The shipped model was fitted on a DataFrame, but every caller here passes
+# plain arrays already in the encoder's column order. Installed once: a
+# catch_warnings() per call would race between the worker and server
+# threads. Only this one message, and only when sklearn raises it, is hidden
+warnings.filterwarnings("ignore", message="X does not have valid feature names", category=UserWarning,
+                        module=r"sklearn\.")
+
+DEFAULT_MODEL_PATH = 'gradient_boosting_model2.pkl'
+DEFAULT_ARTIFACT_PATH = 'gradient_boosting_model2.valmodel'
+
+
+@profiling.timed('load_model')
+def load_model(path=DEFAULT_MODEL_PATH):
+    # Artifacts and compiled .npz files are plain arrays; anything else is a pickle
+    if path.endswith('.valmodel'):
+        from model_artifact import load_artifact
+        return load_artifact(path).model
+    if path.endswith('.npz'):
+        from compiled_model import CompiledGradientBoosting
+        return CompiledGradientBoosting.load(path)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def schema_from_model(model):
+    # Column order the model was fitted with, and the agent/map vocabularies it implies
+    columns = getattr(model, 'feature_names_in_', None)
+    if columns is None:
+        if getattr(model, 'n_features_in_', len(EXPECTED_COLUMN_ORDER)) != len(EXPECTED_COLUMN_ORDER):
+            raise ValueError(f"Model expects {model.n_features_in_} features and has no column names, "
+                             f"but the default column order has {len(EXPECTED_COLUMN_ORDER)}")
+        columns = EXPECTED_COLUMN_ORDER
+    columns = [str(c) for c in columns]
+    agents = [c[len('team1_'):] for c in columns if c.startswith('team1_')]
+    maps = [c[len('Map_'):] for c in columns if c.startswith('Map_')]
+    return columns, agents, maps
+
+
+@profiling.timed('load_predictor')
+def load_predictor(path=None):
+    """Load a model together with its feature schema.
+
+    Returns (model, columns, agents, maps). Without a path, the memory-mapped
+    artifact is preferred and the pickle is the fallback.
+    """
+    if path is None:
+        if os.path.exists(DEFAULT_ARTIFACT_PATH):
+            try:
+                return _load_predictor(DEFAULT_ARTIFACT_PATH)
+            except ValueError as e:
+                if not os.path.exists(DEFAULT_MODEL_PATH):
+                    raise
+                print(f"Falling back to '{DEFAULT_MODEL_PATH}': {e}")
+        path = DEFAULT_MODEL_PATH
+    return _load_predictor(path)
+
+
+def _load_predictor(path):
+    # Undecorated, so the artifact-then-pickle fallback is timed as one load
+    if path.endswith('.valmodel'):
+        from model_artifact import load_artifact
+        artifact = load_artifact(path)
+        return artifact.model, artifact.columns, artifact.agents, artifact.maps
+
+    model = load_model(path)
+    return (model, *schema_from_model(model))
+
+
+@profiling.timed('predict')
+def predict_win_proba(model, X, swap=None):
+    """Probability that Team 1 wins, one value per row of X.
+
+    With swap (an encoder's swap_permutation), every row is also scored with
+    the teams exchanged, both orientations in one predict_proba call, and
+    Team 1's two estimates are averaged. Swapping the teams in the input then
+    gives exactly the complementary probability.
+    """
+    profiling.count('predicted_rows', len(X))
+    if swap is None:
+        return model.predict_proba(X)[:, 1]
+    n = len(X)
+    p = model.predict_proba(np.concatenate([X, X[:, swap]]))[:, 1]
+    return (p[:n] + 1.0 - p[n:]) / 2